@@ -14,7 +14,7 @@ import sys
 
 def run_demo():
     """Run CLI demonstration."""
-    from src.agent import ask
+    from src.agent import ask_many
     
     print("\n" + "="*60)
     print("🎯 ROLE-AWARE FINANCIAL ASSISTANT - DEMO")
@@ -38,6 +38,10 @@ def run_demo():
         }
     ]
     
+    # Answer every (question, role) pair in one batched call
+    pairs = [(test["question"], role) for test in test_cases for role in test["roles"]]
+    responses = iter(ask_many(pairs))
+    
     for test in test_cases:
         print(f"\n{'─'*60}")
         print(f"📋 TEST: {test['description']}")
@@ -46,7 +50,7 @@ def run_demo():
         
         for role in test["roles"]:
             print(f"\n👤 ROLE: {role.upper()}")
-            response = ask(test["question"], role)
+            response = next(responses)
             print(f"💬 RESPONSE:\n{response}\n")
     
     print("\n" + "="*60)
@@ -0,0 +1,35 @@
+"""
+Optional packaging for the assistant.
+
+`pip install -e .` compiles the guardrails module (PII scan, hallucination
+check, audit logging) to a C extension with mypyc when mypy is installed.
+The pure-Python module is used when it isn't, or with ROLE_ASSISTANT_PURE_PYTHON=1.
+"""
+
+import os
+from setuptools import setup
+
+ext_modules = []
+if not os.getenv("ROLE_ASSISTANT_PURE_PYTHON"):
+    try:
+        from mypyc.build import mypycify
+    except ImportError:
+        print("⚠️ mypy not installed - using pure-Python guardrails")
+    else:
+        # src/ has no __init__.py; explicit bases make this module src.guardrails
+        ext_modules = mypycify(["--explicit-package-bases", "src/guardrails.py"])
+
+with open("requirements.txt") as f:
+    install_requires = [
+        line.split("#")[0].strip() for line in f
+        if line.split("#")[0].strip()
+    ]
+
+setup(
+    name="role-aware-financial-assistant",
+    version="0.1.0",
+    packages=["src"],
+    install_requires=install_requires,
+    ext_modules=ext_modules,
+    python_requires=">=3.9",
+)
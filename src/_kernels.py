@@ -0,0 +1,34 @@
+"""Numba-compiled numeric kernels."""
+
+import numpy as np
+from numba import njit, prange
+
+
+@njit(cache=True, parallel=True, fastmath=True)
+def top1(embs, q):
+    """
+    Index and score of the row of `embs` with the largest dot product with `q`.
+
+    Expects C-contiguous float32 arrays; returns (-1, -inf) for an empty matrix.
+    Scores are computed in parallel across rows, then reduced serially (a
+    shared running max inside prange would race).
+    """
+    n = embs.shape[0]
+    scores = np.empty(n, dtype=np.float32)
+    for i in prange(n):
+        s = np.float32(0.0)
+        for j in range(embs.shape[1]):
+            s += embs[i, j] * q[j]
+        scores[i] = s
+
+    best_idx = -1
+    best = -np.inf
+    for i in range(n):
+        if scores[i] > best:
+            best = scores[i]
+            best_idx = i
+    return best_idx, best
+
+
+# Compile (or load from the on-disk cache) at import, not on the first query
+top1(np.zeros((1, 384), dtype=np.float32), np.zeros(384, dtype=np.float32))
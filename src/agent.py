@@ -1,14 +1,26 @@
 """LangGraph workflow and LLM agent."""
 
-from typing import TypedDict, Annotated, List, Optional
-from langchain_core.messages import AnyMessage, SystemMessage, HumanMessage
-from langchain_openai import ChatOpenAI
+import re
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from typing import TypedDict, Annotated, Iterator, List, Optional, Tuple, Union
+from langchain_core.documents import Document
+from langchain_core.messages import AnyMessage, SystemMessage, HumanMessage, AIMessage
+from langchain_core.runnables import RunnableLambda, RunnableConfig
+from langchain_core.tools import tool
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
+from langgraph.prebuilt import ToolNode, tools_condition
 
-from .config import OPENAI_API_KEY, MODEL_NAME, MODEL_TEMPERATURE, MODEL_MAX_TOKENS, validate_config
-from .retriever import get_retriever
-from .guardrails import guardrail_check, log_access, python_calculator
+from .config import (
+    OPENAI_API_KEY, MODEL_NAME, MODEL_TEMPERATURE, MODEL_MAX_TOKENS, validate_config,
+    OPENAI_MAX_CONCURRENCY, OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE
+)
+from .retriever import get_retriever, ROLES
+from .guardrails import guardrail_check, log_access, python_calculator, streamable_prefix
+from .cache import get_query_cache
+from .throttle import RateLimiter, estimate_tokens
 
 
 # ============================================
@@ -19,6 +31,8 @@ class FinancialState(TypedDict):
     messages: Annotated[List[AnyMessage], add_messages]
     user_role: str
     context: str
+    docs: Optional[List[Document]]
+    query_embedding: Optional[np.ndarray]
     guardrail_triggered: Optional[bool]
 
 
@@ -26,127 +40,207 @@ class FinancialState(TypedDict):
 # LLM INITIALIZATION
 # ============================================
 
-validate_config()
-print("⚙️ Initializing GPT-4o-mini...")
+@functools.cache
+def _get_llm():
+    """Create the tool-bound LLM on first use (keeps imports and CLI startup fast)."""
+    from langchain_openai import ChatOpenAI
+    
+    validate_config()
+    print("⚙️ Initializing GPT-4o-mini...")
+    
+    llm = ChatOpenAI(
+        model=MODEL_NAME,
+        temperature=MODEL_TEMPERATURE,
+        max_tokens=MODEL_MAX_TOKENS,
+        api_key=OPENAI_API_KEY
+    )
+    
+    print("✅ GPT-4o-mini is online!")
+    return llm.bind_tools(TOOLS)
+
+
+# ============================================
+# TOOLS
+# ============================================
+
+@tool("python_calculator")
+def python_calculator_tool(code: str) -> str:
+    """Run Python math code for financial calculations (growth, percentages, projections).
+    The code must assign the final value to a variable named 'result'."""
+    print("   🛠️ DETECTED CALCULATION REQUEST. Executing Code...")
+    return python_calculator(code)
+
+
+TOOLS = [python_calculator_tool]
+tool_executor = ToolNode(TOOLS)
 
-llm = ChatOpenAI(
-    model=MODEL_NAME,
-    temperature=MODEL_TEMPERATURE,
-    max_tokens=MODEL_MAX_TOKENS,
-    api_key=OPENAI_API_KEY
+rate_limiter = RateLimiter(
+    max_concurrency=OPENAI_MAX_CONCURRENCY,
+    requests_per_minute=OPENAI_REQUESTS_PER_MINUTE,
+    tokens_per_minute=OPENAI_TOKENS_PER_MINUTE
 )
 
-print("✅ GPT-4o-mini is online!")
+
+def _throttled_invoke(prompt_sequence: List[AnyMessage], config: RunnableConfig) -> AIMessage:
+    """Call the LLM once the rate limiter has capacity."""
+    with rate_limiter.limit(estimate_tokens(prompt_sequence, MODEL_MAX_TOKENS, MODEL_NAME)):
+        return _get_llm().invoke(prompt_sequence, config=config)
+
+
+# Throttled LLM: use .invoke / .batch like the underlying model
+throttled_llm = RunnableLambda(_throttled_invoke)
 
 
 # ============================================
-# WORKFLOW NODES
+# PROMPTS
 # ============================================
 
-# Store retrieved docs for audit logging
-_retrieved_docs = []
+NO_ACCESS_MESSAGE = "I don't have access to that information for your role."
+UNFINISHED_CALCULATION_MESSAGE = "I couldn't finish that calculation. Please try a simpler or more specific question."
+
+# Marker words that can only refer to a given sensitivity tier; roles without
+# that tier are denied without retrieval or an LLM call
+RESTRICTED_QUERY_KEYWORDS = {
+    "insider": ("confidential", "insider"),
+}
+_RESTRICTED_QUERY_RES = {
+    sensitivity: re.compile(r"\b(?:" + "|".join(map(re.escape, keywords)) + r")\b", re.IGNORECASE)
+    for sensitivity, keywords in RESTRICTED_QUERY_KEYWORDS.items()
+}
+
+# Dynamic tone based on role
+ROLE_TONES = {
+    "executive": "Be extremely concise. Use bullet points. Focus on risks and strategic impact.",
+    "product_manager": "Focus on product implications. Highlight timelines and feature impacts.",
+    "analyst": "Be detailed and thorough. Cite specific documents found.",
+}
+
+# Static per-role system prompt, sent first and byte-identical for every call
+# by the same role; the retrieved context follows in its own message. This
+# does not buy OpenAI prompt caching: a request here is one question plus at
+# most 3 short docs, well under the 1024-token minimum for a cached prefix.
+SYSTEM_PREFIX = {
+    role: f"""You are a Financial Insights Assistant.
+
+USER ROLE: {role}
+INSTRUCTION: {tone}
 
+RULES:
+- Only use information from the retrieved context provided below (each entry is "[source, sensitivity] text")
+- If context is empty or irrelevant, say "I don't have access to that information."
+- Never make up financial data
+- If the user asks for a CALCULATION (growth, percentages, projections), call the python_calculator tool
+  with Python code that assigns the final value to a variable named 'result', then answer concisely using its output.
+"""
+    for role, tone in ROLE_TONES.items()
+}
 
-def retrieve_node(state: FinancialState):
-    """Fetch documents based on user's security clearance."""
-    global _retrieved_docs
-    user_query = state["messages"][-1].content
-    user_role = state["user_role"]
 
-    print(f"   🔄 Agent ({user_role}) is retrieving data...")
+# ============================================
+# WORKFLOW NODES
+# ============================================
 
-    retriever = get_retriever()
-    docs = retriever.retrieve(user_query, user_role, k=3)
-    _retrieved_docs = docs  # Store for audit
+def _format_context(docs: List[Document]) -> str:
+    """Format retrieved docs as prompt context: "[source, sensitivity] content" per doc."""
+    parts = []
+    append = parts.append
+    for d in docs:
+        if parts:
+            append("\n\n")
+        append("[")
+        append(d.metadata["source"])
+        append(", ")
+        append(d.metadata["sensitivity"])
+        append("] ")
+        append(d.page_content)
+    return "".join(parts)
+
+
+def _is_denied(user_query: str, user_role: str) -> bool:
+    """
+    True if the query explicitly targets a sensitivity tier the role can't see.
 
-    context_text = "\n\n".join(
-        [f"Source ({d.metadata['sensitivity']}, {d.metadata['source']}): {d.page_content}" 
-         for d in docs]
+    Keywords match as whole words, but without regard to intent: an analyst
+    asking about "insider trading rules" or a product manager about a
+    "confidential roadmap" is denied too. That false positive is deliberate -
+    a role is never sent down the path that asks for restricted data, and can
+    rephrase.
+    """
+    allowed = get_retriever().get_allowed_sensitivities(user_role)
+    return any(
+        sensitivity not in allowed and pattern.search(user_query) is not None
+        for sensitivity, pattern in _RESTRICTED_QUERY_RES.items()
     )
 
-    return {"context": context_text}
 
+def _retrieve_context(user_query: str, user_role: str,
+                      query_embedding: Optional[np.ndarray] = None):
+    """
+    Retrieve role-filtered docs and format them as prompt context.
 
-def generate_node(state: FinancialState):
-    """Generate response using GPT-4o-mini based on role and context (with ReAct for calculations)."""
-    context = state["context"]
+    Pass the query's embedding if the query cache already computed it.
+    """
+    # Guaranteed denial - leave the context empty so generate skips the LLM
+    if _is_denied(user_query, user_role):
+        print(f"   🚫 Agent ({user_role}) query targets restricted data, skipping retrieval")
+        return [], ""
+    docs = get_retriever().retrieve(user_query, user_role, k=3, embedding=query_embedding)
+    return docs, _format_context(docs)
+
+
+def retrieve_node(state: FinancialState):
+    """Fetch documents based on user's security clearance."""
     user_role = state["user_role"]
-    messages = state["messages"]
-
-    # Check if we just got a calculation result
-    last_message = messages[-1]
-    if isinstance(last_message, HumanMessage) and "Calculated Result:" in last_message.content:
-        # We have calculation output - now give final answer
-        system_prompt = "You have the calculated data. Now answer the user's question concisely using the result."
-    else:
-        # Dynamic tone based on role
-        if user_role == "executive":
-            tone = "Be extremely concise. Use bullet points. Focus on risks and strategic impact."
-        elif user_role == "product_manager":
-            tone = "Focus on product implications. Highlight timelines and feature impacts."
-        else:
-            tone = "Be detailed and thorough. Cite specific documents found."
+    print(f"   🔄 Agent ({user_role}) is retrieving data...")
+    docs, context = _retrieve_context(state["messages"][-1].content, user_role,
+                                      state.get("query_embedding"))
+    return {"context": context, "docs": docs}
 
-        system_prompt = f"""You are a Financial Insights Assistant.
 
-USER ROLE: {user_role}
-INSTRUCTION: {tone}
+def _build_prompt(state: FinancialState) -> List[AnyMessage]:
+    """Build the prompt sequence for the current state (role prefix + context)."""
+    user_role = state["user_role"]
+    system_prefix = SYSTEM_PREFIX.get(user_role, SYSTEM_PREFIX["analyst"])
 
-RETRIEVED CONTEXT:
-{context}
+    return [
+        SystemMessage(content=system_prefix),
+        SystemMessage(content=f"RETRIEVED CONTEXT:\n{state['context']}")
+    ] + state["messages"]
 
-RULES:
-- Only use information from the provided context
-- If context is empty or irrelevant, say "I don't have access to that information."
-- Never make up financial data
-- If the user asks for a CALCULATION (growth, percentages, projections), write Python code to compute it.
-  Wrap code in ```python blocks and assign the final value to a variable named 'result'.
-"""
 
-    prompt_sequence = [SystemMessage(content=system_prompt)] + messages
-    response = llm.invoke(prompt_sequence)
+def _apply_guardrails(state: FinancialState, response: AIMessage, docs: List[Document]):
+    """Run guardrails on an LLM response and audit-log final answers."""
+    question = next(m.content for m in reversed(state["messages"]) if isinstance(m, HumanMessage))
 
-    # Apply guardrails
-    passed, final_response = guardrail_check(context, response.content)
+    passed, final_response = guardrail_check(state["context"], response.content)
     
     if not passed:
         return {"messages": [HumanMessage(content=final_response)], "guardrail_triggered": True}
     
     # Log access (only if not a calculation intermediate step)
-    if "```python" not in response.content:
-        log_access(user_role, messages[-1].content, _retrieved_docs, response.content)
+    if not response.tool_calls:
+        log_access(state["user_role"], question, docs, response.content)
 
     return {"messages": [response], "guardrail_triggered": False}
 
 
-def tool_node(state: FinancialState):
-    """Execute Python code if detected in the response (ReAct pattern)."""
-    last_message = state["messages"][-1]
-    content = last_message.content
+def _no_access_response(state: FinancialState):
+    """Answer without calling the LLM when there is no context to answer from."""
+    question = state["messages"][-1].content
+    response = AIMessage(content=NO_ACCESS_MESSAGE)
+    log_access(state["user_role"], question, [], response.content)
+    return {"messages": [response], "guardrail_triggered": False}
 
-    if "```python" in content:
-        print("   🛠️ DETECTED CALCULATION REQUEST. Executing Code...")
-        
-        # Extract the code block
-        code_block = content.split("```python")[1].split("```")[0]
-        
-        # Run the calculator tool
-        output = python_calculator(code_block)
-        
-        # Return result as a new message
-        return {"messages": [HumanMessage(content=output)]}
-    
-    return {"messages": []}
 
+def generate_node(state: FinancialState, config: RunnableConfig):
+    """Generate response using GPT-4o-mini based on role and context (with ReAct for calculations)."""
+    # Nothing retrieved: the answer is predetermined, skip the round trip
+    if not state["context"].strip():
+        return _no_access_response(state)
 
-def should_continue(state: FinancialState):
-    """Router: Check if we need to execute a tool or end."""
-    last_message = state["messages"][-1]
-    
-    if hasattr(last_message, 'content') and "```python" in last_message.content:
-        return "execute_tool"
-    else:
-        return END
+    # Pass config through so token streaming callbacks reach the model
+    response = throttled_llm.invoke(_build_prompt(state), config=config)
+    return _apply_guardrails(state, response, state["docs"])
 
 
 # ============================================
@@ -158,52 +252,255 @@ workflow = StateGraph(FinancialState)
 # Add Nodes
 workflow.add_node("retrieve", retrieve_node)
 workflow.add_node("generate", generate_node)
-workflow.add_node("tool_executor", tool_node)
+workflow.add_node("tools", tool_executor)
 
 # Add Edges
 workflow.set_entry_point("retrieve")
 workflow.add_edge("retrieve", "generate")
 
-# Conditional edge: generate -> tool_executor OR END
+# Conditional edge: generate -> tools (if the LLM made tool calls) OR END
 workflow.add_conditional_edges(
     "generate",
-    should_continue,
+    tools_condition,
     {
-        "execute_tool": "tool_executor",
+        "tools": "tools",
         END: END
     }
 )
 
-# Tool loops back to generate (to process the result)
-workflow.add_edge("tool_executor", "generate")
+# Tool results loop back to generate (to process the result)
+workflow.add_edge("tools", "generate")
 
-agent = workflow.compile()
 
-print("✅ Role-Aware Agent Graph compiled (with ReAct calculator)!")
+@functools.cache
+def _get_agent():
+    """Compile the graph on first use."""
+    agent = workflow.compile()
+    print("✅ Role-Aware Agent Graph compiled (with ReAct calculator)!")
+    return agent
 
 
 # ============================================
 # PUBLIC API
 # ============================================
 
-def ask(question: str, role: str = "analyst") -> str:
+# Upper bound on generate -> calculator rounds in ask_many
+MAX_REACT_ROUNDS = 5
+
+
+def _invalid_role_message(role: str) -> str:
+    return f"❌ Invalid role: {role}. Use 'analyst', 'product_manager', or 'executive'"
+
+
+def ask(question: str, role: str = "analyst", return_docs: bool = False) -> Union[str, Tuple[str, List[Document]]]:
     """
     Main interface to ask questions.
     
     Args:
         question: The user's question
         role: One of 'analyst', 'product_manager', 'executive'
+        return_docs: Also return the docs the answer was based on, so
+            callers can show them without retrieving a second time
     
     Returns:
-        The assistant's response
+        The assistant's response, or (response, docs) if return_docs
+    """
+    if role not in ROLES:
+        response, docs = _invalid_role_message(role), []
+        return (response, docs) if return_docs else response
+    
+    # Serve repeat / near-duplicate questions from the cache (still audited)
+    cache = get_query_cache()
+    hit, query_embedding = cache.get(role, question)
+    if hit is not None:
+        docs, response = hit
+        log_access(role, question, docs, response)
+        return (response, docs) if return_docs else response
+    
+    inputs = {
+        "messages": [HumanMessage(content=question)],
+        "user_role": role,
+        "query_embedding": query_embedding
+    }
+    
+    result = _get_agent().invoke(inputs)
+    response = result['messages'][-1].content
+    docs = result["docs"]
+    
+    if not result.get("guardrail_triggered"):
+        cache.put(role, question, query_embedding, docs, response)
+    
+    return (response, docs) if return_docs else response
+
+
+def ask_stream(question: str, role: str = "analyst",
+               return_docs: bool = False) -> Iterator[Union[str, Tuple[str, List[Document]]]]:
     """
-    if role not in ["analyst", "product_manager", "executive"]:
-        return f"❌ Invalid role: {role}. Use 'analyst', 'product_manager', or 'executive'"
+    Like `ask()`, but yields the response while it is generated.
+    
+    Each yielded value is the full text so far (paired with the retrieved
+    docs if return_docs; these are known before generation starts, so the
+    first value may be an empty text with the docs). The full guardrails run
+    on the complete response, so the last value yielded is always the final,
+    guardrail-checked answer and replaces whatever was streamed before it.
+    Partial text is PII-checked as it arrives: digits and the word in progress
+    are held back until they can't complete a match, and nothing more is
+    streamed once one is found, so blocked details never reach the user.
+    """
+    if role not in ROLES:
+        response = _invalid_role_message(role)
+        yield (response, []) if return_docs else response
+        return
+    
+    cache = get_query_cache()
+    hit, query_embedding = cache.get(role, question)
+    if hit is not None:
+        docs, response = hit
+        log_access(role, question, docs, response)
+        yield (response, docs) if return_docs else response
+        return
     
     inputs = {
         "messages": [HumanMessage(content=question)],
-        "user_role": role
+        "user_role": role,
+        "query_embedding": query_embedding
     }
     
-    result = agent.invoke(inputs)
-    return result['messages'][-1].content
+    partial = ""
+    message_id = None
+    result = None
+    docs = None
+    pii_found = False
+    for mode, chunk in _get_agent().stream(inputs, stream_mode=["messages", "values"]):
+        if mode == "values":
+            result = chunk
+            # Docs land in the state after retrieval, before any tokens
+            if return_docs and docs is None and chunk.get("docs") is not None:
+                docs = chunk["docs"]
+                yield partial, docs
+            continue
+        message, metadata = chunk
+        if metadata.get("langgraph_node") != "generate" or not isinstance(message.content, str):
+            continue
+        # A new LLM call (e.g. the answer after a calculation) starts a fresh text
+        if message.id != message_id:
+            message_id = message.id
+            partial = ""
+        if message.content and not pii_found:
+            partial += message.content
+            visible = streamable_prefix(partial)
+            # Withhold the rest of the stream; the guardrail's block message follows
+            if visible is None:
+                pii_found = True
+                continue
+            yield (visible, docs) if return_docs else visible
+    
+    response = result['messages'][-1].content
+    docs = result["docs"]
+    
+    if not result.get("guardrail_triggered"):
+        cache.put(role, question, query_embedding, docs, response)
+    
+    yield (response, docs) if return_docs else response
+
+
+def ask_many(questions: List[Tuple[str, str]], max_concurrency: int = 10) -> List[str]:
+    """
+    Answer many questions with batched LLM calls.
+    
+    Retrieval runs concurrently and every generate step is sent as a single
+    `llm.batch` call, so N questions cost one round of overlapping requests
+    instead of N sequential round trips. Guardrails, the calculator loop,
+    audit logging and the query cache behave exactly as in `ask()`.
+    
+    Args:
+        questions: List of (question, role) pairs
+        max_concurrency: Max in-flight retrievals / LLM requests
+    
+    Returns:
+        Responses in the same order as `questions`
+    """
+    results: List[Optional[str]] = [None] * len(questions)
+    cache = get_query_cache()
+    
+    # Answer invalid roles and cache hits up front
+    pending = []
+    for i, (question, role) in enumerate(questions):
+        if role not in ROLES:
+            results[i] = _invalid_role_message(role)
+            continue
+        hit, query_embedding = cache.get(role, question)
+        if hit is not None:
+            docs, response = hit
+            log_access(role, question, docs, response)
+            results[i] = response
+            continue
+        pending.append((i, question, role, query_embedding))
+    
+    if not pending:
+        return results
+    
+    print(f"   🔄 Agent is retrieving data for {len(pending)} queries...")
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        retrieved = list(pool.map(lambda item: _retrieve_context(item[1], item[2], item[3]), pending))
+    
+    jobs = []
+    for (i, question, role, query_embedding), (docs, context_text) in zip(pending, retrieved):
+        jobs.append({
+            "index": i,
+            "embedding": query_embedding,
+            "docs": docs,
+            "state": {
+                "messages": [HumanMessage(content=question)],
+                "user_role": role,
+                "context": context_text,
+                "guardrail_triggered": False
+            }
+        })
+    
+    # Nothing retrieved: answer directly, without an LLM call
+    active = []
+    for job in jobs:
+        if job["state"]["context"].strip():
+            active.append(job)
+        else:
+            job["state"]["messages"] += _no_access_response(job["state"])["messages"]
+    
+    # Batched ReAct loop: generate for every active query, run calculators, repeat
+    for _ in range(MAX_REACT_ROUNDS):
+        if not active:
+            break
+        responses = throttled_llm.batch(
+            [_build_prompt(job["state"]) for job in active],
+            config={"max_concurrency": max_concurrency}
+        )
+        still_active = []
+        for job, response in zip(active, responses):
+            state = job["state"]
+            update = _apply_guardrails(state, response, job["docs"])
+            state["messages"] = state["messages"] + update["messages"]
+            state["guardrail_triggered"] = update["guardrail_triggered"]
+            if tools_condition(state) == "tools":
+                tool_messages = [python_calculator_tool.invoke(call) for call in response.tool_calls]
+                state["messages"] = state["messages"] + tool_messages
+                still_active.append(job)
+        active = still_active
+    
+    # Still calling the calculator after MAX_REACT_ROUNDS: answer with a
+    # fallback rather than the raw tool output, and audit it like any answer
+    for job in active:
+        job["unfinished"] = True
+        question, role = questions[job["index"]]
+        response = AIMessage(content=UNFINISHED_CALCULATION_MESSAGE)
+        log_access(role, question, job["docs"], response.content)
+        job["state"]["messages"] = job["state"]["messages"] + [response]
+    
+    for job in jobs:
+        question, role = questions[job["index"]]
+        final_message = job["state"]["messages"][-1]
+        results[job["index"]] = final_message.content
+        # Only cache real answers (not guardrail blocks or unfinished calculations)
+        if isinstance(final_message, AIMessage) and not job.get("unfinished"):
+            cache.put(role, question, job["embedding"], job["docs"], final_message.content)
+    
+    return results
@@ -0,0 +1,192 @@
+"""Query-result cache for the agent (exact + semantic hits)."""
+
+import os
+import atexit
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .config import (
+    MODEL_NAME, QA_CACHE_FILE, QA_CACHE_MAX_ENTRIES, QA_CACHE_SAVE_DELAY, SEMANTIC_CACHE_THRESHOLD
+)
+from .retriever import get_retriever, corpus_fingerprint
+
+
+CacheHit = Tuple[List[Document], str]
+
+
+# Numba kernel, loaded on first use: starting numba's thread pool before a
+# server forks its workers would hang the parent at exit
+_top1 = None
+_top1_lock = threading.Lock()
+
+
+def get_top1():
+    """Import (and JIT-compile / load) the similarity kernel once per process."""
+    global _top1
+    if _top1 is None:
+        with _top1_lock:
+            if _top1 is None:
+                from ._kernels import top1
+                top1(np.zeros((1, 1), dtype=np.float32), np.zeros(1, dtype=np.float32))
+                _top1 = top1
+    return _top1
+
+
+def normalize_query(question: str) -> str:
+    """Normalize a question for exact-match lookups."""
+    return " ".join(question.lower().split())
+
+
+class QueryCache:
+    """
+    LRU cache of (docs, response) keyed by (role, normalized query).
+
+    Misses on the exact key fall back to a semantic lookup: the query
+    embedding is compared against cached queries *of the same role* and
+    reused when cosine similarity clears the threshold. The role is part of
+    every key so a cached answer never crosses an RBAC boundary.
+
+    Writes are persisted by a timer thread QA_CACHE_SAVE_DELAY seconds after
+    the first unsaved `put`, never on the request path; call `flush` to write
+    pending entries right away (the global instance is flushed at exit).
+    """
+
+    def __init__(self, path: str = QA_CACHE_FILE, max_entries: int = QA_CACHE_MAX_ENTRIES,
+                 threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        self.path = path
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._fingerprint = hashlib.sha256(
+            (corpus_fingerprint() + MODEL_NAME).encode("utf-8")
+        ).hexdigest()
+        self._lock = threading.Lock()
+        # (role, normalized query) -> (embedding, docs, response)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[np.ndarray, List[Document], str]]" = OrderedDict()
+        # role -> (keys, stacked embeddings), rebuilt lazily after writes
+        self._matrices: Dict[str, Tuple[List[Tuple[str, str]], np.ndarray]] = {}
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        self._save_lock = threading.Lock()  # one writer at a time
+        self._load()
+
+    def _load(self):
+        """Load persisted entries, discarding them if the corpus or model changed."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                payload = pickle.load(f)
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable query cache: {e}")
+            return
+        if payload.get("fingerprint") == self._fingerprint:
+            self._entries = payload["entries"]
+
+    def _save(self, entries: "OrderedDict[Tuple[str, str], Tuple[np.ndarray, List[Document], str]]"):
+        """Persist a snapshot of the entries atomically."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"fingerprint": self._fingerprint, "entries": entries}, f)
+        os.replace(tmp_path, self.path)
+
+    def flush(self):
+        """Write unsaved entries to disk now."""
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                if not self._dirty:
+                    return
+                # Shallow copy: pickling happens outside the lock `get` needs
+                snapshot = OrderedDict(self._entries)
+                self._dirty = False
+            try:
+                self._save(snapshot)
+            except Exception as e:
+                print(f"⚠️ Could not persist query cache: {e}")
+
+    def _matrix(self, role: str) -> Tuple[List[Tuple[str, str]], np.ndarray]:
+        """Stacked embeddings of cached queries for one role."""
+        if role not in self._matrices:
+            keys = [key for key in self._entries if key[0] == role]
+            if keys:
+                embs = np.ascontiguousarray(
+                    np.stack([self._entries[key][0] for key in keys]), dtype=np.float32
+                )
+            else:
+                embs = np.empty((0, 0), dtype=np.float32)
+            self._matrices[role] = (keys, embs)
+        return self._matrices[role]
+
+    @staticmethod
+    def embed(question: str) -> np.ndarray:
+        """Unit-normalized query embedding (dot product == cosine similarity)."""
+        q = np.asarray(get_retriever().embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(q)
+        return q / norm if norm else q
+
+    def get(self, role: str, question: str) -> Tuple[Optional[CacheHit], Optional[np.ndarray]]:
+        """
+        Look up a cached answer.
+
+        Returns (hit, embedding). The embedding is None on an exact hit; on a
+        miss it is handed back so `put` doesn't have to embed the query again.
+        """
+        key = (role, normalize_query(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return (entry[1], entry[2]), None
+
+        q = self.embed(question)
+        # Load the kernel before taking the lock, so the one-off import and
+        # compile don't stall every other request
+        top1 = get_top1()
+        with self._lock:
+            keys, embs = self._matrix(role)
+            if keys:
+                best, score = top1(embs, q)
+                if score >= self.threshold:
+                    entry = self._entries[keys[best]]
+                    self._entries.move_to_end(keys[best])
+                    return (entry[1], entry[2]), q
+        return None, q
+
+    def put(self, role: str, question: str, embedding: Optional[np.ndarray],
+            docs: List[Document], response: str):
+        """Store an answer (persisted shortly after, in the background)."""
+        if embedding is None:
+            embedding = self.embed(question)
+        key = (role, normalize_query(question))
+        with self._lock:
+            self._entries[key] = (embedding, docs, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrices.clear()
+            self._dirty = True
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(QA_CACHE_SAVE_DELAY, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+
+# Global instance
+query_cache = None
+
+def get_query_cache() -> QueryCache:
+    """Get or create the global query cache."""
+    global query_cache
+    if query_cache is None:
+        query_cache = QueryCache()
+        atexit.register(query_cache.flush)
+    return query_cache
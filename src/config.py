@@ -14,12 +14,32 @@ MODEL_NAME = "gpt-4o-mini"
 MODEL_TEMPERATURE = 0.1
 MODEL_MAX_TOKENS = 512
 
-# Embedding Model
+# OpenAI client-side throttling (gpt-4o-mini tier-1 limits)
+OPENAI_MAX_CONCURRENCY = 8
+OPENAI_REQUESTS_PER_MINUTE = 500
+OPENAI_TOKENS_PER_MINUTE = 200_000
+
+# Embedding Model (served by ONNX Runtime; the backend is part of cache keys)
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = "onnx-int8"
+
+# FAISS HNSW index parameters
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
 
 # Audit Log
 AUDIT_LOG_FILE = "audit_log.jsonl"
 
+# On-disk cache (FAISS index, etc.)
+CACHE_DIR = ".cache"
+
+# Query-result cache (exact + semantic hits)
+QA_CACHE_FILE = os.path.join(CACHE_DIR, "qa_cache.pkl")
+QA_CACHE_MAX_ENTRIES = 1024
+SEMANTIC_CACHE_THRESHOLD = 0.95
+QA_CACHE_SAVE_DELAY = 1.0  # seconds; writes within this window are persisted together
+
 # Suppress tokenizer warnings
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
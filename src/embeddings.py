@@ -0,0 +1,115 @@
+"""Sentence embeddings served by ONNX Runtime."""
+
+import os
+import threading
+from typing import List
+
+import numpy as np
+from filelock import FileLock
+from langchain_core.embeddings import Embeddings
+
+from .config import EMBEDDING_MODEL, CACHE_DIR
+
+
+QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+
+
+def _hub_model_id(model_name: str) -> str:
+    """Resolve short sentence-transformers names (e.g. all-MiniLM-L6-v2) to hub ids."""
+    if "/" in model_name or os.path.isdir(model_name):
+        return model_name
+    return f"sentence-transformers/{model_name}"
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence-transformer embeddings on ONNX Runtime (CPU).
+
+    The model is exported to ONNX and int8 dynamically quantized (VNNI
+    dot-product kernels where available) once, cached under CACHE_DIR, and
+    reloaded from there. ONNX Runtime applies its full graph optimizations
+    (fused LayerNorm / GELU / attention) when the session is created.
+    Pooling matches sentence-transformers for MiniLM: attention-masked mean
+    of the last hidden state, L2-normalized.
+
+    The runtime (optimum / transformers / torch) is imported and the session
+    created on the first embed call, so loading cached indexes stays cheap.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, batch_size: int = 32):
+        self.model_id = _hub_model_id(model_name)
+        self.batch_size = batch_size
+        self._tokenizer = None
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    def _load(self):
+        """Create the tokenizer and ORT session (once)."""
+        if self._model is not None:
+            return self._tokenizer, self._model
+        with self._load_lock:
+            if self._model is None:
+                from optimum.onnxruntime import ORTModelForFeatureExtraction
+                from transformers import AutoTokenizer
+
+                model_dir = self._export()
+                self._tokenizer = AutoTokenizer.from_pretrained(model_dir)
+                self._model = ORTModelForFeatureExtraction.from_pretrained(
+                    model_dir,
+                    file_name=QUANTIZED_MODEL_FILE,
+                    provider="CPUExecutionProvider"
+                )
+        return self._tokenizer, self._model
+
+    def reset(self):
+        """Drop the tokenizer and ORT session; the next embed call loads them again."""
+        with self._load_lock:
+            self._tokenizer = None
+            self._model = None
+
+    def _export(self) -> str:
+        """Export and quantize the model on first use; return the cached model dir."""
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+
+        slug = os.path.basename(self.model_id.rstrip("/"))
+        onnx_dir = os.path.join(CACHE_DIR, f"{slug}-onnx")
+        model_dir = os.path.join(CACHE_DIR, f"{slug}-onnx-int8")
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with FileLock(model_dir + ".lock"):
+            if not os.path.exists(os.path.join(onnx_dir, "model.onnx")):
+                print(f"⚙️ Exporting {self.model_id} to ONNX (one-time)...")
+                model = ORTModelForFeatureExtraction.from_pretrained(self.model_id, export=True)
+                model.save_pretrained(onnx_dir)
+                AutoTokenizer.from_pretrained(self.model_id).save_pretrained(onnx_dir)
+            if not os.path.exists(os.path.join(model_dir, QUANTIZED_MODEL_FILE)):
+                # Quantize the plain export: ORT's fused contrib ops (what O2+ emits)
+                # defeat the quantizer's shape inference, and ORT re-applies those
+                # fusions itself when the session is created.
+                print(f"⚙️ Quantizing {self.model_id} to int8 (one-time)...")
+                ORTQuantizer.from_pretrained(onnx_dir).quantize(
+                    save_dir=model_dir,
+                    quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+                )
+                AutoTokenizer.from_pretrained(onnx_dir).save_pretrained(model_dir)
+        return model_dir
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        tokenizer, model = self._load()
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            inputs = tokenizer(batch, padding="longest", truncation=True, return_tensors="np")
+            hidden = model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"][..., None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.extend(pooled.tolist())
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
@@ -1,10 +1,19 @@
 """Security guardrails and audit logging."""
 
+import os
 import re
+import ast
 import json
 import math
+import functools
+import time
+import queue
+import types
+import atexit
+import operator
+import threading
 from datetime import datetime
-from typing import List, Tuple
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple, Union
 from langchain_core.documents import Document
 
 from .config import AUDIT_LOG_FILE
@@ -14,21 +23,55 @@ from .config import AUDIT_LOG_FILE
 # PII DETECTION
 # ============================================
 
-PII_PATTERNS = {
+PII_PATTERNS: Dict[str, str] = {
     "ssn": r"\b\d{3}-\d{2}-\d{4}\b",
     "credit_card": r"\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b",
     "email": r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b",
     "phone": r"\b\d{3}[-.]?\d{3}[-.]?\d{4}\b"
 }
 
+# All patterns as one alternation, compiled once: a single scan per response.
+# Alternation order follows PII_PATTERNS, so overlapping matches at the same
+# position resolve the same way (e.g. a card number is reported as credit_card).
+PII_RE = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in PII_PATTERNS.items()))
+
 def check_pii(text: str) -> Tuple[bool, str]:
     """Check if text contains PII patterns."""
-    for pii_type, pattern in PII_PATTERNS.items():
-        if re.search(pattern, text):
-            return True, pii_type
+    match = PII_RE.search(text)
+    if match is not None and match.lastgroup is not None:
+        return True, match.lastgroup
     return False, ""
 
 
+def check_pii_batch(texts: List[str]) -> List[Tuple[bool, str]]:
+    """Check several texts against the precompiled PII alternation; results match `check_pii`."""
+    search = PII_RE.search
+    results: List[Tuple[bool, str]] = []
+    for text in texts:
+        match = search(text)
+        if match is not None and match.lastgroup is not None:
+            results.append((True, match.lastgroup))
+        else:
+            results.append((False, ""))
+    return results
+
+
+# Trailing text of a partial response that could still grow into a PII match:
+# a run of digits/separators and the word in progress
+_PII_TAIL_RE = re.compile(r"[\d\s.@+-]*\S*$")
+
+def streamable_prefix(text: str) -> Optional[str]:
+    """Part of a partial (still streaming) response that is safe to show; None once it contains PII."""
+    if PII_RE.search(text) is not None:
+        return None
+    match = _PII_TAIL_RE.search(text)
+    return text[:match.start()] if match is not None else text
+
+
+# Phrases that signal a confident, sourced-sounding answer
+CONFIDENCE_PHRASES: Tuple[str, ...] = ("according to", "the data shows", "based on the documents")
+
+
 def guardrail_check(context: str, response: str) -> Tuple[bool, str]:
     """
     Check guardrails:
@@ -42,9 +85,10 @@ def guardrail_check(context: str, response: str) -> Tuple[bool, str]:
     
     # Check hallucination
     if not context.strip() and len(response) > 100:
-        confidence_phrases = ["according to", "the data shows", "based on the documents"]
-        if any(phrase in response.lower() for phrase in confidence_phrases):
-            return False, "[BLOCKED: Potential hallucination - no context but confident answer]"
+        lowered = response.lower()
+        for phrase in CONFIDENCE_PHRASES:
+            if phrase in lowered:
+                return False, "[BLOCKED: Potential hallucination - no context but confident answer]"
     
     return True, response
 
@@ -53,9 +97,112 @@ def guardrail_check(context: str, response: str) -> Tuple[bool, str]:
 # AUDIT LOGGING
 # ============================================
 
-def log_access(user_role: str, query: str, docs_accessed: List[Document], response: str):
+# Entries are queued and written by a background thread through a file handle
+# kept open for the life of the process, so the request path never touches disk.
+AUDIT_FLUSH_EVERY = 50       # entries
+AUDIT_FLUSH_INTERVAL = 0.5   # seconds
+AUDIT_FLUSH_TIMEOUT = 5.0    # max wait in flush_audit_log
+
+_log_queue: "queue.Queue[Union[str, threading.Event, None]]" = queue.Queue()
+_audit_fh: Optional[TextIO] = None
+_writer_thread: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+
+
+def _flush_log(fh: TextIO) -> None:
+    """Flush the audit log, reporting (not raising) I/O errors such as a full disk."""
+    try:
+        fh.flush()
+    except Exception as e:
+        print(f"⚠️ Audit log flush failed: {e}")
+
+
+def _writer_loop(fh: TextIO) -> None:
+    """Drain the queue, flushing every AUDIT_FLUSH_EVERY entries or AUDIT_FLUSH_INTERVAL seconds."""
+    pending = 0
+    last_flush = time.monotonic()
+    while True:
+        try:
+            item = _log_queue.get(timeout=AUDIT_FLUSH_INTERVAL)
+        except queue.Empty:
+            item = ""
+        if item is None:  # shutdown sentinel
+            _flush_log(fh)
+            return
+        if isinstance(item, threading.Event):  # explicit flush request
+            _flush_log(fh)
+            pending = 0
+            last_flush = time.monotonic()
+            item.set()
+            continue
+        if item:
+            # A failed write loses this entry, but the writer keeps running
+            try:
+                fh.write(item)
+                pending += 1
+            except Exception as e:
+                print(f"⚠️ Audit log write failed: {e}")
+        if pending and (pending >= AUDIT_FLUSH_EVERY or time.monotonic() - last_flush >= AUDIT_FLUSH_INTERVAL):
+            _flush_log(fh)
+            pending = 0
+            last_flush = time.monotonic()
+
+
+def _ensure_writer() -> None:
+    """Open the audit log and start the writer thread on first use."""
+    global _audit_fh, _writer_thread
+    if _writer_thread is not None:
+        return
+    with _writer_lock:
+        if _writer_thread is None:
+            _audit_fh = open(AUDIT_LOG_FILE, "a")
+            thread = threading.Thread(target=_writer_loop, args=(_audit_fh,), name="audit-log-writer", daemon=True)
+            thread.start()
+            _writer_thread = thread
+
+
+def flush_audit_log() -> None:
+    """Block until every queued entry has been written and flushed (at most AUDIT_FLUSH_TIMEOUT seconds)."""
+    if _writer_thread is None or not _writer_thread.is_alive():
+        return
+    done = threading.Event()
+    _log_queue.put(done)
+    if not done.wait(timeout=AUDIT_FLUSH_TIMEOUT):
+        print("⚠️ Audit log flush timed out")
+
+
+def _drain_and_close() -> None:
+    """Write out remaining entries and close the log at interpreter exit."""
+    global _writer_thread
+    if _writer_thread is None:
+        return
+    _log_queue.put(None)
+    _writer_thread.join(timeout=5)
+    if _audit_fh is not None:
+        _audit_fh.close()
+    _writer_thread = None
+
+
+atexit.register(_drain_and_close)
+
+
+def _reset_writer_after_fork() -> None:
+    """A forked child inherits the queue and handle but not the writer thread; start fresh."""
+    global _log_queue, _audit_fh, _writer_thread, _writer_lock
+    _log_queue = queue.Queue()
+    _audit_fh = None
+    _writer_thread = None
+    _writer_lock = threading.Lock()
+
+
+# Flushing first leaves nothing buffered in the inherited handle for the child to re-write
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=flush_audit_log, after_in_child=_reset_writer_after_fork)
+
+
+def log_access(user_role: str, query: str, docs_accessed: List[Document], response: str) -> Dict[str, Any]:
     """Log every query for compliance tracking."""
-    log_entry = {
+    log_entry: Dict[str, Any] = {
         "timestamp": datetime.now().isoformat(),
         "user_role": user_role,
         "query": query,
@@ -65,8 +212,8 @@ def log_access(user_role: str, query: str, docs_accessed: List[Document], respon
         "guardrail_triggered": False
     }
     
-    with open(AUDIT_LOG_FILE, "a") as f:
-        f.write(json.dumps(log_entry) + "\n")
+    _ensure_writer()
+    _log_queue.put(json.dumps(log_entry) + "\n")
     
     return log_entry
 
@@ -75,12 +222,167 @@ def log_access(user_role: str, query: str, docs_accessed: List[Document], respon
 # PYTHON CALCULATOR TOOL
 # ============================================
 
+# Calculator code is restricted to arithmetic on numbers, variables, the math
+# module and a few numeric builtins - no attribute walking, strings or imports
+# beyond `import math`. Arithmetic runs through _calc_binop, which only takes
+# numbers and caps integer size, so model-written code can't hang the server
+# or exhaust memory (9**9**9**9, [0]*10**10, math.factorial(10**9)).
+_CALC_MAX_INT_BITS = 4096       # ~1233 decimal digits
+_CALC_MAX_COMBINATORIC_N = 1000  # factorial / comb / perm
+_CALC_MAX_NDIGITS = 100          # round()
+_CALC_NUMBER = (int, float, complex)
+
+
+def _calc_check_int(value: Any) -> Any:
+    if isinstance(value, int) and value.bit_length() > _CALC_MAX_INT_BITS:
+        raise ValueError("number too large")
+    return value
+
+
+def _calc_pow(base: Any, exp: Any, mod: Any = None) -> Any:
+    """pow() that refuses integer results beyond _CALC_MAX_INT_BITS before computing them."""
+    if not (isinstance(base, _CALC_NUMBER) and isinstance(exp, _CALC_NUMBER)):
+        raise ValueError("arithmetic is only allowed on numbers")
+    if mod is not None:
+        return pow(base, exp, mod)
+    if isinstance(base, int) and isinstance(exp, int) and exp > 0 and abs(base) > 1:
+        if (abs(base).bit_length() - 1) * exp > _CALC_MAX_INT_BITS:
+            raise ValueError("number too large")
+    return _calc_check_int(base ** exp)
+
+
+_CALC_BINOPS: Dict[str, Callable[[Any, Any], Any]] = {
+    "Add": operator.add, "Sub": operator.sub, "Mult": operator.mul, "Div": operator.truediv,
+    "FloorDiv": operator.floordiv, "Mod": operator.mod, "Pow": _calc_pow,
+}
+
+
+def _calc_binop(op: str, left: Any, right: Any) -> Any:
+    """Evaluate one binary operation of calculator code with type and size checks."""
+    if not (isinstance(left, _CALC_NUMBER) and isinstance(right, _CALC_NUMBER)):
+        raise ValueError("arithmetic is only allowed on numbers")
+    if op == "Mult" and isinstance(left, int) and isinstance(right, int):
+        if left.bit_length() + right.bit_length() > _CALC_MAX_INT_BITS + 1:
+            raise ValueError("number too large")
+    return _calc_check_int(_CALC_BINOPS[op](left, right))
+
+
+def _calc_round(number: Any, ndigits: Any = None) -> Any:
+    if ndigits is not None and abs(ndigits) > _CALC_MAX_NDIGITS:
+        raise ValueError("ndigits too large")
+    return round(number, ndigits)
+
+
+def _calc_factorial(n: Any) -> Any:
+    if n > _CALC_MAX_COMBINATORIC_N:
+        raise ValueError("argument too large")
+    return math.factorial(n)
+
+
+def _calc_comb(n: Any, k: Any) -> Any:
+    if n > _CALC_MAX_COMBINATORIC_N:
+        raise ValueError("argument too large")
+    return math.comb(n, k)
+
+
+def _calc_perm(n: Any, k: Any = None) -> Any:
+    if n > _CALC_MAX_COMBINATORIC_N:
+        raise ValueError("argument too large")
+    return math.perm(n, k)
+
+
+# What `math` means inside calculator code: the module's public names with the
+# unbounded combinatorics capped (a copy, so code can't patch the real module)
+_calc_math_names: Dict[str, Any] = {name: getattr(math, name) for name in dir(math) if not name.startswith("_")}
+_calc_math_names.update(factorial=_calc_factorial, comb=_calc_comb, perm=_calc_perm)
+_CALC_MATH = types.SimpleNamespace(**_calc_math_names)
+
+_CALC_FUNCTIONS: Dict[str, Any] = {
+    "abs": abs, "round": _calc_round, "min": min, "max": max, "sum": sum,
+    "pow": _calc_pow, "float": float, "int": int, "len": len,
+}
+_CALC_NODES = (
+    ast.Module, ast.Expr, ast.Assign, ast.AugAssign, ast.Import, ast.alias,
+    ast.Name, ast.Load, ast.Store, ast.Constant, ast.BinOp, ast.UnaryOp,
+    ast.operator, ast.unaryop, ast.Call, ast.keyword, ast.Attribute,
+    ast.Tuple, ast.List,
+)
+
+
+def _calc_import(name: str, *args: Any, **kwargs: Any) -> Any:
+    if name != "math":
+        raise ImportError(f"import of '{name}' is not allowed")
+    return _CALC_MATH
+
+
+_CALC_BUILTINS: Dict[str, Any] = {**_CALC_FUNCTIONS, "__import__": _calc_import}
+
+
+def _check_calc_node(node: ast.AST) -> None:
+    """Reject anything outside the calculator whitelist."""
+    if not isinstance(node, _CALC_NODES):
+        raise ValueError(f"'{type(node).__name__}' is not allowed")
+    if isinstance(node, ast.Import) and any(alias.name != "math" for alias in node.names):
+        raise ValueError("only 'import math' is allowed")
+    if isinstance(node, ast.Name) and node.id.startswith("_"):
+        raise ValueError(f"name '{node.id}' is not allowed")
+    if isinstance(node, ast.Attribute) and not (
+        isinstance(node.value, ast.Name) and node.value.id == "math" and not node.attr.startswith("_")
+        and isinstance(node.ctx, ast.Load)
+    ):
+        raise ValueError("only math.<function> attributes are allowed")
+    if isinstance(node, (ast.BinOp, ast.AugAssign)) and type(node.op).__name__ not in _CALC_BINOPS:
+        raise ValueError(f"operator '{type(node.op).__name__}' is not allowed")
+    if isinstance(node, ast.Call) and not (
+        isinstance(node.func, ast.Attribute)
+        or (isinstance(node.func, ast.Name) and node.func.id in _CALC_FUNCTIONS)
+    ):
+        raise ValueError("only math and basic numeric functions can be called")
+    if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, complex)):
+        raise ValueError("only numeric constants are allowed")
+
+
+def _calc_binop_call(op: ast.operator, left: ast.expr, right: ast.expr) -> ast.Call:
+    return ast.Call(
+        func=ast.Name(id="__calc_binop__", ctx=ast.Load()),
+        args=[ast.Constant(value=type(op).__name__), left, right],
+        keywords=[],
+    )
+
+
+def _guard_arithmetic(node: Any) -> Any:
+    """Rewrite `a <op> b` and `x <op>= b` (bottom-up) into checked __calc_binop__ calls."""
+    for field, value in ast.iter_fields(node):
+        if isinstance(value, list):
+            setattr(node, field, [_guard_arithmetic(item) if isinstance(item, ast.AST) else item for item in value])
+        elif isinstance(value, ast.AST):
+            setattr(node, field, _guard_arithmetic(value))
+    if isinstance(node, ast.BinOp):
+        return ast.copy_location(_calc_binop_call(node.op, node.left, node.right), node)
+    if isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
+        current = ast.Name(id=node.target.id, ctx=ast.Load())
+        return ast.copy_location(
+            ast.Assign(targets=[node.target], value=_calc_binop_call(node.op, current, node.value)), node
+        )
+    return node
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_calculation(clean_code: str) -> Any:
+    """Parse, validate and compile calculator code (cached per source)."""
+    tree = ast.parse(clean_code, mode="exec")
+    for node in ast.walk(tree):
+        _check_calc_node(node)
+    tree = ast.fix_missing_locations(_guard_arithmetic(tree))
+    return compile(tree, "<calc>", "exec")
+
+
 def python_calculator(code_snippet: str) -> str:
     """Execute Python math code safely."""
     try:
-        local_scope = {"math": math}
+        local_scope: Dict[str, Any] = {"math": _CALC_MATH}
         clean_code = code_snippet.replace("```python", "").replace("```", "").strip()
-        exec(clean_code, {}, local_scope)
+        exec(_compile_calculation(clean_code), {"__builtins__": _CALC_BUILTINS, "__calc_binop__": _calc_binop}, local_scope)
         
         if 'result' in local_scope:
             return f"Calculated Result: {local_scope['result']}"
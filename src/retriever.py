@@ -1,19 +1,53 @@
 """Vector store and Role-Based Access Control (RBAC)."""
 
-from typing import List, Set
+import os
+import json
+import hashlib
+from typing import List, Optional, Sequence, Set
+import faiss
+import numpy as np
+from filelock import FileLock
 from langchain_core.documents import Document
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
 
-from .config import EMBEDDING_MODEL
+from .config import (
+    EMBEDDING_MODEL, EMBEDDING_BACKEND, CACHE_DIR,
+    HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH
+)
 from .data import RAW_FINANCIAL_DATA
+from .embeddings import OnnxEmbeddings
+
+
+ROLES = ("analyst", "product_manager", "executive")
+
+
+def corpus_fingerprint() -> str:
+    """Hash of the corpus + embedding model, used to key on-disk caches."""
+    return hashlib.sha256(
+        (EMBEDDING_MODEL + EMBEDDING_BACKEND + json.dumps(RAW_FINANCIAL_DATA, sort_keys=True)).encode("utf-8")
+    ).hexdigest()
+
+
+# Bump when the index type or layout changes so stale on-disk indexes are ignored
+INDEX_LAYOUT = "hnsw-ip"
+
+
+def _index_cache_path() -> str:
+    """
+    Cache location for the per-role FAISS indexes.
+    Keyed on the build-time HNSW parameters too; efSearch is set on load.
+    """
+    layout = f"{INDEX_LAYOUT}-m{HNSW_M}-efc{HNSW_EF_CONSTRUCTION}"
+    return os.path.join(CACHE_DIR, f"faiss_{layout}_{corpus_fingerprint()}")
 
 
 class SecureRetriever:
     """Vector store with role-based access control."""
     
     def __init__(self):
-        print("⚙️ Initializing Vector Store with HuggingFace Embeddings...")
+        print("⚙️ Initializing Vector Store with ONNX Runtime Embeddings...")
         
         # Create documents
         self.documents = [
@@ -22,17 +56,65 @@ class SecureRetriever:
         ]
         
         # Initialize embeddings
-        self.embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+        self.embeddings = OnnxEmbeddings(model_name=EMBEDDING_MODEL, batch_size=64)
         
-        # Create vector store
-        self.vector_store = FAISS.from_documents(
-            documents=self.documents,
-            embedding=self.embeddings
-        )
+        # One index per role over only the docs that role may see, so a
+        # search never touches (or wastes k on) unreachable vectors.
+        # Indexes are loaded from disk, or built and persisted; the lock keeps
+        # concurrently booting workers from racing on the build.
+        index_path = _index_cache_path()
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        self.indexes = {}
+        doc_embeddings = None
+        with FileLock(index_path + ".lock"):
+            for role in ROLES:
+                role_path = os.path.join(index_path, role)
+                if os.path.isdir(role_path):
+                    self.indexes[role] = FAISS.load_local(
+                        role_path,
+                        self.embeddings,
+                        allow_dangerous_deserialization=True,
+                        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+                    )
+                    self.indexes[role].index.hnsw.efSearch = HNSW_EF_SEARCH
+                    continue
+                
+                # Embed the whole corpus in one batched pass, shared by all roles
+                if doc_embeddings is None:
+                    doc_embeddings = self.embeddings.embed_documents(
+                        [doc.page_content for doc in self.documents]
+                    )
+                allowed = self.get_allowed_sensitivities(role)
+                role_docs = [
+                    (doc, emb) for doc, emb in zip(self.documents, doc_embeddings)
+                    if doc.metadata.get("sensitivity", "public") in allowed
+                ]
+                self.indexes[role] = self._build_index(role_docs)
+                self.indexes[role].save_local(role_path)
         
         print(f"✅ Ingested {len(self.documents)} documents into vector store.")
         print("✅ RBAC Logic defined (3 roles: analyst, product_manager, executive)")
     
+    def _build_index(self, doc_embeddings: List[tuple]) -> FAISS:
+        """
+        HNSW index (sub-linear search as the corpus grows) over (doc, embedding) pairs.
+        Embeddings are L2-normalized, so inner product == cosine similarity.
+        """
+        vectors = np.asarray([emb for _, emb in doc_embeddings], dtype=np.float32)
+        index = faiss.IndexHNSWFlat(vectors.shape[1], HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.add(vectors)
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        
+        ids = [str(i) for i in range(len(doc_embeddings))]
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore({doc_id: doc for doc_id, (doc, _) in zip(ids, doc_embeddings)}),
+            index_to_docstore_id=dict(enumerate(ids)),
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+        )
+    
     def get_allowed_sensitivities(self, user_role: str) -> Set[str]:
         """Get allowed sensitivity levels for a role."""
         if user_role == "executive":
@@ -42,28 +124,25 @@ class SecureRetriever:
         else:  # analyst or default
             return {"public"}
     
-    def retrieve(self, query: str, user_role: str, k: int = 3) -> List[Document]:
+    def retrieve(self, query: str, user_role: str, k: int = 3,
+                 embedding: Optional[Sequence[float]] = None) -> List[Document]:
         """
         Retrieve documents with role-based filtering.
-        FAISS doesn't support metadata filtering, so we filter post-retrieval.
+        Searches the role's own index, so every hit is already allowed.
+        Pass the query's `embedding` if it is already known (e.g. from the
+        query cache) to skip embedding it again.
         """
-        allowed = self.get_allowed_sensitivities(user_role)
-        
-        # Get more results than needed, then filter
-        all_docs = self.vector_store.similarity_search(query, k=k * 3)
-        
-        # Filter by role's allowed sensitivity levels
-        filtered_docs = [
-            doc for doc in all_docs 
-            if doc.metadata.get("sensitivity", "public") in allowed
-        ]
-        
-        # Return top k after filtering
-        return filtered_docs[:k]
+        index = self.indexes.get(user_role, self.indexes["analyst"])  # analyst is the default
+        if embedding is None:
+            return index.similarity_search(query, k=k)
+        return index.similarity_search_by_vector(embedding, k=k)
     
     def get_docs_display(self, query: str, user_role: str) -> str:
         """Get formatted display of retrieved documents."""
-        docs = self.retrieve(query, user_role, k=3)
+        return self.format_docs_display(self.retrieve(query, user_role, k=3))
+    
+    def format_docs_display(self, docs: List[Document]) -> str:
+        """Format already-retrieved documents for display."""
         if not docs:
             return "No documents retrieved."
         
@@ -0,0 +1,79 @@
+"""Client-side rate limiting for OpenAI calls."""
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import List
+
+import tiktoken
+from langchain_core.messages import AnyMessage
+
+
+class RateLimiter:
+    """
+    Proactive throttle: caps in-flight requests and keeps requests/tokens
+    within a 60s sliding window, so bursts wait briefly instead of tripping
+    429s and paying retry backoff.
+    """
+
+    WINDOW_SECONDS = 60.0
+
+    def __init__(self, max_concurrency: int, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._window = deque()  # (timestamp, tokens)
+        self._window_tokens = 0
+
+    def _prune(self, now: float):
+        while self._window and now - self._window[0][0] >= self.WINDOW_SECONDS:
+            _, tokens = self._window.popleft()
+            self._window_tokens -= tokens
+
+    def _reserve(self, tokens: int):
+        """Block until the window has room, then record the request."""
+        # A single oversized request must still be allowed through eventually
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._prune(now)
+                if (len(self._window) < self.requests_per_minute
+                        and self._window_tokens + tokens <= self.tokens_per_minute):
+                    self._window.append((now, tokens))
+                    self._window_tokens += tokens
+                    return
+                wait = self.WINDOW_SECONDS - (now - self._window[0][0])
+            time.sleep(max(wait, 0.01))
+
+    @contextmanager
+    def limit(self, tokens: int):
+        """Hold a concurrency slot and window capacity for one request."""
+        with self._semaphore:
+            self._reserve(tokens)
+            yield
+
+
+_encoding = None
+_encoding_unavailable = False
+
+def estimate_tokens(messages: List[AnyMessage], max_tokens: int, model: str) -> int:
+    """Tokens a request counts against TPM: prompt tokens + max completion tokens."""
+    global _encoding, _encoding_unavailable
+    text = "".join(m.content for m in messages if isinstance(m.content, str))
+    if _encoding is None and not _encoding_unavailable:
+        try:
+            try:
+                _encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                # Model unknown to this tiktoken; gpt-4o family encoding
+                _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # Encoding files can't be fetched (e.g. offline) - fall back to an estimate
+            print(f"⚠️ tiktoken unavailable, estimating tokens from length: {e}")
+            _encoding_unavailable = True
+    if _encoding is None:
+        return len(text) // 4 + max_tokens
+    return len(_encoding.encode(text)) + max_tokens
@@ -1,27 +1,24 @@
 """Gradio UI for the Financial Assistant."""
 
 import gradio as gr
-from .agent import ask
+from .agent import ask_stream
 from .retriever import get_retriever
-from .vision import generate_sample_chart, get_chart_insights, analyze_chart
+from .vision import generate_sample_chart, analyze_chart_stream, CHART_INSIGHTS_QUERY
 
 
 def chat_with_role(message: str, history: list, role: str):
-    """Chat function for Gradio interface."""
+    """Chat function for Gradio interface (streams the response)."""
     if not message.strip():
-        return history, "Please enter a question."
+        yield history, "Please enter a question."
+        return
     
-    # Get response
-    response = ask(message, role)
-    
-    # Get docs display for transparency
+    # The agent hands back the docs it used (none retrieved again for display,
+    # and none at all on a cache hit)
     retriever = get_retriever()
-    docs_display = retriever.get_docs_display(message, role)
-    
-    # Update history
-    history = history + [[message, response]]
     
-    return history, docs_display
+    # Stream the response into the chat history, with docs for transparency
+    for partial, docs in ask_stream(message, role, return_docs=True):
+        yield history + [[message, partial]], retriever.format_docs_display(docs)
 
 
 def update_role_info(selected_role: str) -> str:
@@ -166,22 +163,26 @@ def create_ui():
                 return None, f"❌ Error generating chart: {e}"
         
         def analyze_uploaded_chart(image_path, query):
+            """Stream the chart answer into the results panel."""
             try:
                 print(f"🔍 Analyzing: path={image_path}, query={query}")
                 if not image_path:
-                    return "⚠️ **Please upload a chart first** or click '🎨 Generate Sample Chart' button on the left."
+                    yield "⚠️ **Please upload a chart first** or click '🎨 Generate Sample Chart' button on the left."
+                    return
                 if not query.strip():
-                    return get_chart_insights(image_path)
+                    header, query = "📊 **Chart Analysis (GPT-4o-mini Vision):**", CHART_INSIGHTS_QUERY
+                else:
+                    header = "📊 **Answer:**"
                 
                 # Use GPT-4o-mini Vision for chart Q&A
-                response = analyze_chart(image_path, query)
+                for partial in analyze_chart_stream(image_path, query):
+                    yield f"{header}\n\n{partial}"
                 print(f"📊 GPT-4o-mini response received")
-                return f"📊 **Answer:**\n\n{response}"
             except Exception as e:
                 print(f"❌ Analysis error: {e}")
                 import traceback
                 traceback.print_exc()
-                return f"❌ Error analyzing chart: {e}"
+                yield f"❌ Error analyzing chart: {e}"
         
         generate_chart_btn.click(gen_chart, outputs=[chart_image, chart_results])
         analyze_btn.click(
@@ -205,6 +206,7 @@ def launch_ui():
     print("   Open http://localhost:7860 in your browser\n")
     
     demo = create_ui()
+    demo.queue()  # required for streaming (generator) handlers
     demo.launch(
         server_name="0.0.0.0",
         server_port=7860,
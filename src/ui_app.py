@@ -0,0 +1,35 @@
+"""
+ASGI app for serving the Gradio UI from several worker processes.
+
+    gunicorn src.ui_app:app --preload -w 4 -k uvicorn.workers.UvicornWorker -b 0.0.0.0:7860
+
+With --preload this module is imported once in the gunicorn master: the FAISS
+indexes are loaded (or built) and the LangGraph workflow compiled there, so
+workers start from the loaded indexes and compiled graph instead of each
+paying for them. Thread pools and network clients (ONNX Runtime session,
+OpenAI client, numba kernels) don't survive a fork, so they start lazily
+inside each worker - which means every worker loads its own copy of the
+embedding model on its first query; the model weights are not shared.
+Requires fork (Linux); on macOS/Windows workers are spawned and every worker
+initializes on its own.
+"""
+
+import gradio as gr
+from fastapi import FastAPI
+
+from .agent import _get_agent
+from .retriever import get_retriever
+from .ui import create_ui
+
+
+# Pre-fork initialization (inherited by all workers)
+retriever = get_retriever()
+# Building missing indexes embeds the corpus, which starts an ORT session;
+# drop it so no worker inherits a session without its thread pool
+retriever.embeddings.reset()
+_get_agent()
+
+demo = create_ui()
+demo.queue()  # required for streaming (generator) handlers
+
+app = gr.mount_gradio_app(FastAPI(), demo, path="/")
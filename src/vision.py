@@ -1,129 +1,362 @@
 """Vision RAG module using GPT-4o-mini for financial chart analysis."""
 
 import os
+import io
+import json
+import time
 import base64
-import matplotlib.pyplot as plt
-import numpy as np
-from PIL import Image
-from typing import List, Tuple, Optional
+import atexit
+import asyncio
+import hashlib
+import functools
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Iterator, List, Literal, Tuple, Optional, Union
 
-from openai import OpenAI
 from dotenv import load_dotenv
+from tenacity import AsyncRetrying, retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 
 load_dotenv()
 
-# Initialize OpenAI client
-_client = None
+VISION_MODEL = "gpt-4o-mini"
 
+# Committed copy of the demo chart (see generate_sample_chart)
+SAMPLE_CHART_ASSET = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "sample_revenue_chart.png"
+)
 
+# Answers are cached on disk per (image bytes, question, model)
+VISION_CACHE_DIR = Path(os.getenv("VISION_CACHE_DIR", os.path.join(".cache", "vision")))
+VISION_CACHE_TTL_DAYS = float(os.getenv("VISION_CACHE_TTL_DAYS", "30"))
+
+# Images are sent as JPEG no larger than this on either side; the API
+# downscales anything bigger anyway, so larger uploads only cost bytes
+VISION_MAX_IMAGE_SIDE = 1024
+VISION_JPEG_QUALITY = 85
+
+# Max chart requests in flight in analyze_charts_async
+VISION_CONCURRENCY = int(os.getenv("VISION_CONCURRENCY", "8"))
+VISION_MAX_ATTEMPTS = 3
+
+# Batch API polling interval (seconds); batches complete within 24h
+BATCH_POLL_SECONDS = 30
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+# OpenAI clients (openai, PIL and matplotlib are imported where they're
+# used, so importing this module stays cheap)
+
+
+def _http_client_options() -> dict:
+    """Shared pool settings: HTTP/2 multiplexing and kept-alive TLS connections."""
+    import httpx
+    return dict(
+        http2=True,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+        timeout=httpx.Timeout(60.0, connect=5.0)
+    )
+
+
+@functools.lru_cache(maxsize=1)
 def get_openai_client():
     """Get or create OpenAI client."""
-    global _client
-    if _client is None:
-        _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    return _client
+    import httpx
+    from openai import OpenAI
+    http_client = httpx.Client(**_http_client_options())
+    atexit.register(http_client.close)
+    # Retries are handled by _VISION_RETRY, not stacked on top of the SDK's own
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client, max_retries=0)
+
+
+def create_async_openai_client():
+    """
+    Create an async OpenAI client; use it as an async context manager.
+    
+    Pooled connections belong to the event loop that opened them, so the
+    client can't outlive one loop: analyze_charts_async opens one per call,
+    shares it across that call's concurrent requests, and closes its pool
+    on the way out.
+    """
+    import httpx
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=httpx.AsyncClient(**_http_client_options()),
+        max_retries=0
+    )
 
 
 def encode_image_to_base64(image_path: str) -> str:
     """Convert image file to base64 string."""
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
+    return _encode_image(_read_image(image_path)[0])[0]
+
+
+# Image formats the vision API accepts as uploaded (PIL format -> media type)
+_MEDIA = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp", "GIF": "image/gif"}
+
+
+def _prepare_image_for_api(data: bytes) -> Tuple[bytes, str]:
+    """
+    Shrink an image for upload: (bytes, media type).
+    
+    Small JPEG/WEBP files are sent as is. Anything else is scaled down to
+    VISION_MAX_IMAGE_SIDE and re-encoded as JPEG - unless the original file
+    is smaller still, as flat-colour rendered charts often are as PNG.
+    """
+    from PIL import Image
+    
+    img = Image.open(io.BytesIO(data))
+    # Animated GIFs aren't accepted, so those always go through the re-encode
+    source_format = img.format if not getattr(img, "is_animated", False) else None
+    if source_format in ("JPEG", "WEBP") and max(img.size) <= VISION_MAX_IMAGE_SIDE:
+        return data, _MEDIA[source_format]
+    
+    if img.mode in ("RGBA", "LA", "P"):
+        # Flatten transparency onto white (charts are drawn for a light background)
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, "white")
+        background.paste(img, mask=img.getchannel("A"))
+        img = background
+    else:
+        img = img.convert("RGB")
+    img.thumbnail((VISION_MAX_IMAGE_SIDE, VISION_MAX_IMAGE_SIDE), Image.Resampling.LANCZOS)
+    
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=VISION_JPEG_QUALITY, optimize=True)
+    jpeg = buf.getvalue()
+    
+    if source_format in _MEDIA and len(data) <= len(jpeg):
+        return data, _MEDIA[source_format]
+    return jpeg, "image/jpeg"
+
+
+def _read_image(image_path: str) -> Tuple[bytes, str]:
+    """Read an image once; return (file bytes, sha256). Cheap enough to run before the cache lookup."""
+    # Unbuffered: FileIO.readall sizes one read from fstat, no intermediate buffer copy
+    with open(image_path, "rb", buffering=0) as image_file:
+        data = image_file.readall()
+    return data, hashlib.sha256(data).hexdigest()
+
+
+def _encode_image(data: bytes) -> Tuple[str, str]:
+    """(base64 upload payload, media type) - only needed on a cache miss."""
+    payload, media_type = _prepare_image_for_api(data)
+    return base64.b64encode(payload).decode("ascii"), media_type
+
+
+def _cache_key(image_hash: str, query: str, detail: str) -> str:
+    """Cache key for one (image, question, detail level, model)."""
+    query_hash = hashlib.sha256((query + detail + VISION_MODEL).encode("utf-8")).hexdigest()
+    return hashlib.sha256((image_hash + query_hash).encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str) -> Optional[str]:
+    """Cached answer for key, or None if missing or expired."""
+    path = VISION_CACHE_DIR / f"{key}.json"
+    try:
+        entry = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry["timestamp"] > entry["ttl"]:
+        return None
+    return entry["response"]
+
+
+def _cache_put(key: str, response: Optional[str]):
+    """
+    Store an answer (atomically, so concurrent readers never see partial files).
+    
+    Best effort: the answer was already paid for, so a failed write (full
+    disk, read-only cache dir) is reported and otherwise ignored. Empty
+    answers (a refusal, a stream that produced nothing) are not stored.
+    """
+    if not response:
+        return
+    tmp_path = None
+    try:
+        VISION_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Unique per write, so threads storing the same key don't collide
+        fd, tmp_path = tempfile.mkstemp(dir=VISION_CACHE_DIR, prefix=f"{key}.", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({
+                "timestamp": time.time(),
+                "ttl": VISION_CACHE_TTL_DAYS * 86400,
+                "response": response
+            }, f)
+        os.replace(tmp_path, VISION_CACHE_DIR / f"{key}.json")
+    except Exception as e:
+        print(f"⚠️ Could not cache chart answer: {e}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _cached_or_payload(image_path: str, query: str,
+                       detail: str) -> Tuple[str, Union[str, Tuple[str, str]]]:
+    """
+    Shared front half of every analysis path: (cache key, answer or payload).
+    
+    The file is hashed for the cache lookup; only on a miss is it transcoded
+    and encoded, giving the (base64 image, media type) payload instead of a
+    cached answer string.
+    """
+    data, image_hash = _read_image(image_path)
+    key = _cache_key(image_hash, query, detail)
+    cached = _cache_get(key)
+    if cached is not None:
+        return key, cached
+    return key, _encode_image(data)
 
 
 def generate_sample_chart() -> str:
-    """Generate a sample financial chart for demo purposes."""
+    """
+    Provide the sample financial chart for demo purposes.
+    
+    The chart is static, so it is copied from the committed asset. Set
+    REGENERATE_SAMPLE_CHART=1 to re-render the asset with matplotlib (e.g.
+    after changing the data or styling in _render_sample_chart).
+    """
     # Use absolute path to ensure Gradio can find it
     script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     chart_path = os.path.join(script_dir, "sample_revenue_chart.png")
     
-    # Always regenerate to ensure fresh chart
-    if os.path.exists(chart_path):
-        os.remove(chart_path)
+    if os.getenv("REGENERATE_SAMPLE_CHART") or not os.path.exists(SAMPLE_CHART_ASSET):
+        _render_sample_chart(SAMPLE_CHART_ASSET)
+    # Copy then rename, so concurrent callers (e.g. parallel test workers)
+    # never see a half-written chart
+    tmp_path = f"{chart_path}.{os.getpid()}.tmp"
+    shutil.copyfile(SAMPLE_CHART_ASSET, tmp_path)
+    os.replace(tmp_path, chart_path)
+    
+    print(f"✅ Generated sample chart: {chart_path}")
+    return chart_path
+
+
+def _render_sample_chart(chart_path: str):
+    """Render the sample chart with matplotlib."""
+    os.makedirs(os.path.dirname(chart_path), exist_ok=True)
     
     # Create sample revenue data
     years = ['2021', '2022', '2023', '2024']
     revenue = [10.0, 15.5, 22.3, 18.1]  # Note the dip in 2024
     colors = ['#4CAF50', '#4CAF50', '#4CAF50', '#f44336']  # Red for decline
+    title = "NVIDIA Annual Revenue (Billions USD)"
+    figsize = (8, 5)
+    dpi = 100
+    
+    # Object-oriented API on the Agg canvas: no pyplot state or figure manager
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
     
-    plt.figure(figsize=(8, 5))
-    bars = plt.bar(years, revenue, color=colors, edgecolor='black', linewidth=1.2)
-    plt.title("NVIDIA Annual Revenue (Billions USD)", fontsize=14, fontweight='bold')
-    plt.xlabel("Fiscal Year", fontsize=12)
-    plt.ylabel("Revenue ($B)", fontsize=12)
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    bars = ax.bar(years, revenue, color=colors, edgecolor='black', linewidth=1.2)
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.set_xlabel("Fiscal Year", fontsize=12)
+    ax.set_ylabel("Revenue ($B)", fontsize=12)
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
     
-    # Add value labels
-    for bar, val in zip(bars, revenue):
-        plt.text(bar.get_x() + bar.get_width()/2, val + 0.5, 
-                f"${val}B", ha='center', va='bottom', fontsize=11, fontweight='bold')
+    # Add value labels (one call for all bars)
+    ax.bar_label(bars, labels=[f"${v}B" for v in revenue], padding=3, fontsize=11, fontweight='bold')
+    ax.margins(y=0.1)  # headroom so the tallest label stays inside the axes
     
     # Add trend annotation
-    plt.annotate('↓ Decline', xy=(3, 18.1), xytext=(3.3, 20),
+    ax.annotate('↓ Decline', xy=(3, 18.1), xytext=(3.3, 20),
                 fontsize=10, color='red',
                 arrowprops=dict(arrowstyle='->', color='red'))
     
-    plt.tight_layout()
-    plt.savefig(chart_path, dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
+    fig.tight_layout()
+    # Written to a temp file and renamed into place
+    tmp_path = f"{chart_path}.{os.getpid()}.tmp"
+    fig.savefig(tmp_path, format="png", dpi=dpi, bbox_inches='tight', facecolor='white', pil_kwargs={"optimize": True})
+    os.replace(tmp_path, chart_path)
     
-    print(f"✅ Generated sample chart: {chart_path}")
-    return chart_path
+    print(f"✅ Rendered sample chart: {chart_path}")
+
+
+# Shared by every request; never mutated
+_SYSTEM_MSG = {
+    "role": "system",
+    "content": "You are a financial analyst expert at reading and interpreting charts, graphs, and financial visualizations. Provide clear, accurate, and concise answers based on what you see in the image."
+}
+
+
+# How closely the model looks at the image: "low" is a single 512px view at a
+# flat token cost - enough for simple bar/line charts; "high" adds 512px tiles
+# of the full-resolution image (several times the tokens and latency) for dense
+# dashboards and small print; "auto" lets the API choose from the image size.
+ImageDetail = Literal["low", "auto", "high"]
+
 
+def _build_vision_messages(query: str, data_url: str, detail: ImageDetail = "auto") -> List[dict]:
+    """Messages for one chart question: the shared system message + question and image."""
+    return [
+        _SYSTEM_MSG,
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": query},
+                {"type": "image_url", "image_url": {"url": data_url, "detail": detail}},
+            ]
+        }
+    ]
 
-def analyze_chart(image_path: str, query: str) -> str:
+
+def _build_request(query: str, base64_image: str, media_type: str, detail: ImageDetail = "auto") -> dict:
+    """Chat Completions arguments for one chart question."""
+    return dict(
+        model=VISION_MODEL,
+        messages=_build_vision_messages(query, f"data:{media_type};base64,{base64_image}", detail),
+        max_tokens=500
+    )
+
+
+def _is_transient(error: BaseException) -> bool:
+    """Rate limits, timeouts, connection drops and 5xx are worth retrying."""
+    from openai import RateLimitError, APIConnectionError, InternalServerError
+    return isinstance(error, (RateLimitError, APIConnectionError, InternalServerError))
+
+
+# Up to VISION_MAX_ATTEMPTS tries, backing off ~1s, 2s, 4s (capped at 8s) with jitter
+_VISION_RETRY = dict(
+    retry=retry_if_exception(_is_transient),
+    wait=wait_exponential_jitter(initial=1, max=8),
+    stop=stop_after_attempt(VISION_MAX_ATTEMPTS),
+    reraise=True
+)
+
+
+@retry(**_VISION_RETRY)
+def _create_with_retry(**request):
+    """chat.completions.create, retrying transient errors."""
+    return get_openai_client().chat.completions.create(**request)
+
+
+def analyze_chart(image_path: str, query: str, detail: ImageDetail = "auto") -> str:
     """
     Analyze a financial chart image using GPT-4o-mini Vision.
     
     Args:
         image_path: Path to the chart image
         query: Question about the chart
+        detail: Image detail level - "low" for simple charts (cheapest,
+            fastest), "high" for complex dashboards, "auto" to let the API pick
     
     Returns:
         AI-generated answer about the chart
     """
     try:
-        client = get_openai_client()
-        
-        # Encode image to base64
-        base64_image = encode_image_to_base64(image_path)
-        
-        # Determine image type
-        if image_path.lower().endswith(".png"):
-            media_type = "image/png"
-        elif image_path.lower().endswith((".jpg", ".jpeg")):
-            media_type = "image/jpeg"
-        else:
-            media_type = "image/png"
+        key, result = _cached_or_payload(image_path, query, detail)
+        if isinstance(result, str):
+            return result
+        base64_image, media_type = result
         
         # Call GPT-4o-mini with vision
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a financial analyst expert at reading and interpreting charts, graphs, and financial visualizations. Provide clear, accurate, and concise answers based on what you see in the image."
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": query
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:{media_type};base64,{base64_image}",
-                                "detail": "high"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=500
-        )
+        response = _create_with_retry(**_build_request(query, base64_image, media_type, detail))
         
-        return response.choices[0].message.content
+        answer = response.choices[0].message.content
+        _cache_put(key, answer)
+        return answer
         
     except Exception as e:
         print(f"⚠️ Chart analysis error: {e}")
@@ -132,13 +365,154 @@ def analyze_chart(image_path: str, query: str) -> str:
         return f"Error analyzing chart: {e}"
 
 
-def get_chart_insights(image_path: str) -> str:
+def analyze_chart_stream(image_path: str, query: str, detail: ImageDetail = "auto") -> Iterator[str]:
     """
-    Get automatic insights from a financial chart using GPT-4o-mini Vision.
+    Like `analyze_chart`, but yields the answer while it is generated.
     
-    Returns a formatted string with the analysis results.
+    Each yielded value is the full text so far; on an error the last value
+    is the error message instead.
+    """
+    try:
+        key, result = _cached_or_payload(image_path, query, detail)
+        if isinstance(result, str):
+            yield result
+            return
+        base64_image, media_type = result
+        
+        # Transient errors are retried until the stream opens; not mid-stream
+        stream = _create_with_retry(**_build_request(query, base64_image, media_type, detail), stream=True)
+        
+        answer = ""
+        for chunk in stream:
+            token = chunk.choices[0].delta.content if chunk.choices else None
+            if token:
+                answer += token
+                yield answer
+        
+        _cache_put(key, answer)
+        
+    except Exception as e:
+        print(f"⚠️ Chart analysis error: {e}")
+        yield f"Error analyzing chart: {e}"
+
+
+async def analyze_charts_async(pairs: List[Tuple[str, str]], detail: ImageDetail = "auto") -> List[str]:
+    """
+    Analyze many (image_path, query) pairs concurrently.
+    
+    Up to VISION_CONCURRENCY requests are in flight at once, so N charts take
+    roughly as long as the slowest few instead of the sum of all of them.
+    Transient errors are retried like analyze_chart's, and answers share
+    its cache.
+    
+    Returns:
+        One answer per pair, in order (an error message for pairs that failed)
+    """
+    semaphore = asyncio.Semaphore(VISION_CONCURRENCY)
+    
+    async def _one(client, image_path: str, query: str) -> str:
+        async with semaphore:
+            try:
+                key, result = await asyncio.to_thread(_cached_or_payload, image_path, query, detail)
+                if isinstance(result, str):
+                    return result
+                base64_image, media_type = result
+                request = _build_request(query, base64_image, media_type, detail)
+                async for attempt in AsyncRetrying(**_VISION_RETRY):
+                    with attempt:
+                        response = await client.chat.completions.create(**request)
+                answer = response.choices[0].message.content
+                _cache_put(key, answer)
+                return answer
+            except Exception as e:
+                print(f"⚠️ Chart analysis error ({image_path}): {e}")
+                return f"Error analyzing chart: {e}"
+    
+    async with create_async_openai_client() as client:
+        return await asyncio.gather(*(_one(client, path, query) for path, query in pairs))
+
+
+def _build_batch_line(custom_id: str, image_path: str, query: str, detail: ImageDetail = "auto") -> str:
+    """One Batch API request line (the same request analyze_chart sends)."""
+    base64_image, media_type = _encode_image(_read_image(image_path)[0])
+    body = _build_request(query, base64_image, media_type, detail)
+    return json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body})
+
+
+def analyze_charts_batch(items: List[Tuple[str, str]], wait: bool = True, detail: ImageDetail = "auto"):
+    """
+    Analyze many (image_path, query) pairs through the OpenAI Batch API.
+    
+    Half the token price of real-time calls and outside the per-minute rate
+    limits, but results can take up to 24h - for reports and evals, not chat.
+    
+    Args:
+        items: (image_path, query) pairs
+        wait: Poll until the batch finishes and return the answers; if False,
+            return the batch id right away (collect with wait_for_batch)
+        detail: Image detail level for every item (see analyze_chart)
+    
+    Returns:
+        One answer per item, in order, or the batch id if not waiting
     """
-    query = """Analyze this financial chart and provide:
+    client = get_openai_client()
+    
+    # Stream requests to disk one at a time rather than holding every image in memory
+    with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+        for i, (image_path, query) in enumerate(items):
+            f.write(_build_batch_line(f"chart-{i}", image_path, query, detail) + "\n")
+        batch_path = f.name
+    try:
+        with open(batch_path, "rb") as f:
+            batch_file = client.files.create(file=f, purpose="batch")
+    finally:
+        os.remove(batch_path)
+    
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    print(f"📦 Submitted chart batch {batch.id} ({len(items)} requests)")
+    
+    if not wait:
+        return batch.id
+    return wait_for_batch(batch.id, len(items))
+
+
+def wait_for_batch(batch_id: str, num_items: int) -> List[str]:
+    """Poll a batch from analyze_charts_batch until it finishes; return answers in order."""
+    client = get_openai_client()
+    
+    batch = client.batches.retrieve(batch_id)
+    while batch.status not in BATCH_TERMINAL_STATUSES:
+        time.sleep(BATCH_POLL_SECONDS)
+        batch = client.batches.retrieve(batch_id)
+    print(f"📦 Chart batch {batch_id} {batch.status}")
+    
+    answers = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            response = result.get("response") or {}
+            if response.get("status_code") == 200:
+                answers[result["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+            else:
+                error = result.get("error") or response.get("body", {}).get("error")
+                answers[result["custom_id"]] = f"Error analyzing chart: {error}"
+    
+    return [
+        answers.get(f"chart-{i}", f"Error analyzing chart: batch {batch.status} without a result")
+        for i in range(num_items)
+    ]
+
+
+# Question asked when the user wants general insights rather than a specific answer
+CHART_INSIGHTS_QUERY = """Analyze this financial chart and provide:
 1. What company/topic does this chart show?
 2. What type of chart is this?
 3. What is the time period covered?
@@ -146,8 +520,28 @@ def get_chart_insights(image_path: str) -> str:
 5. Any notable data points (highest, lowest, changes)?
 
 Be concise but thorough."""
+
+
+def get_chart_insights(image_path: str, mode: str = "online", detail: ImageDetail = "auto") -> str:
+    """
+    Get automatic insights from a financial chart using GPT-4o-mini Vision.
     
-    response = analyze_chart(image_path, query)
+    Args:
+        image_path: Path to the chart image
+        mode: "online" (real-time call) or "batch" (Batch API: cheaper, but
+            blocks until the batch completes)
+        detail: Image detail level (see analyze_chart)
+    
+    Returns a formatted string with the analysis results.
+    """
+    query = CHART_INSIGHTS_QUERY
+    
+    if mode == "batch":
+        response = analyze_charts_batch([(image_path, query)], detail=detail)[0]
+    elif mode == "online":
+        response = analyze_chart(image_path, query, detail)
+    else:
+        raise ValueError(f"Unknown mode: {mode}. Use 'online' or 'batch'")
     
     return f"📊 **Chart Analysis (GPT-4o-mini Vision):**\n\n{response}"
 
@@ -168,7 +562,8 @@ def test_vision():
     test_query = "What company's revenue is shown in this chart, and what was the revenue in 2024?"
     print(f"❓ Question: {test_query}\n")
     
-    response = analyze_chart(chart_path, test_query)
+    # A simple bar chart reads fine from the low-detail view
+    response = analyze_chart(chart_path, test_query, detail="low")
     
     print("📊 GPT-4o-mini Response:")
     print("-" * 50)
@@ -4,6 +4,7 @@ Comprehensive Test Suite for Role-Aware Financial Assistant
 ============================================================
 
 Run with: python -m pytest tests/test_all.py -v
+In parallel: python -m pytest -n 8 --dist loadgroup tests/test_all.py
 Or simply: python tests/test_all.py
 """
 
@@ -13,16 +14,58 @@ import os
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import json
+import time
+import tempfile
 import unittest
+from collections import deque
 from unittest.mock import patch, MagicMock
 
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
 
+try:
+    import pytest
+    # Tests that call the OpenAI API share one xdist worker (run with
+    # --dist loadgroup) so they stay within rate limits; the rest spread out
+    openai_group = pytest.mark.xdist_group(name="openai")
+except ImportError:  # plain `python tests/test_all.py`
+    def openai_group(cls):
+        return cls
+
+import src.cache
+import src.agent
+from src.agent import ask, ask_many
+from src.retriever import get_retriever, SecureRetriever
+from src.guardrails import (
+    check_pii, check_pii_batch, guardrail_check, streamable_prefix, python_calculator, flush_audit_log
+)
+from src.cache import QueryCache
+from src import throttle
+from src.throttle import RateLimiter, estimate_tokens
+
+
+_query_cache_dir = None
+
+def setUpModule():
+    """Give ask() an empty, throwaway query cache so every test reaches retrieval and the LLM."""
+    global _query_cache_dir
+    _query_cache_dir = tempfile.TemporaryDirectory()
+    src.cache.query_cache = QueryCache(path=os.path.join(_query_cache_dir.name, "qa_cache.pkl"))
+
+def tearDownModule():
+    src.cache.query_cache.flush()
+    src.cache.query_cache = None
+    _query_cache_dir.cleanup()
+
+
+@openai_group
 class TestRBACAccessControl(unittest.TestCase):
     """Test Role-Based Access Control functionality."""
     
     def test_analyst_blocked_from_insider(self):
         """Analyst should NOT see insider data about Project Blackwell."""
-        from src.agent import ask
         response = ask("What is the status of Project Blackwell?", role="analyst")
         # Should indicate no access or lack of information
         self.assertTrue(
@@ -36,7 +79,6 @@ class TestRBACAccessControl(unittest.TestCase):
     
     def test_executive_sees_insider(self):
         """Executive should see confidential Project Blackwell delay info."""
-        from src.agent import ask
         response = ask("What is the status of Project Blackwell?", role="executive")
         # Should mention delay or TSMC
         self.assertTrue(
@@ -50,7 +92,6 @@ class TestRBACAccessControl(unittest.TestCase):
     
     def test_product_manager_sees_product_data(self):
         """Product Manager should see product roadmap but NOT insider delays."""
-        from src.agent import ask
         response = ask("What is the product roadmap for 2025?", role="product_manager")
         # Should mention product info
         self.assertTrue(
@@ -64,7 +105,6 @@ class TestRBACAccessControl(unittest.TestCase):
     
     def test_analyst_sees_public_data(self):
         """Analyst should see public financial data."""
-        from src.agent import ask
         response = ask("What was Q3 revenue?", role="analyst")
         # Should mention revenue figures
         self.assertTrue(
@@ -77,7 +117,6 @@ class TestRBACAccessControl(unittest.TestCase):
     
     def test_invalid_role_rejected(self):
         """Invalid roles should be rejected."""
-        from src.agent import ask
         response = ask("Test query", role="hacker")
         self.assertIn("invalid role", response.lower())
         print("✅ Test 5: Invalid role rejected")
@@ -86,11 +125,13 @@ class TestRBACAccessControl(unittest.TestCase):
 class TestRetrieverFiltering(unittest.TestCase):
     """Test the secure retriever filtering logic."""
     
+    @classmethod
+    def setUpClass(cls):
+        cls.retriever = get_retriever()
+    
     def test_analyst_only_gets_public(self):
         """Analyst retriever should only return public documents."""
-        from src.retriever import get_retriever
-        retriever = get_retriever()
-        docs = retriever.retrieve("revenue", "analyst", k=5)
+        docs = self.retriever.retrieve("revenue", "analyst", k=5)
         for doc in docs:
             self.assertEqual(
                 doc.metadata.get("sensitivity"), "public",
@@ -100,9 +141,7 @@ class TestRetrieverFiltering(unittest.TestCase):
     
     def test_pm_gets_public_and_product(self):
         """Product Manager should get public and product docs."""
-        from src.retriever import get_retriever
-        retriever = get_retriever()
-        docs = retriever.retrieve("roadmap", "product_manager", k=5)
+        docs = self.retriever.retrieve("roadmap", "product_manager", k=5)
         allowed = {"public", "product"}
         for doc in docs:
             self.assertIn(
@@ -113,9 +152,7 @@ class TestRetrieverFiltering(unittest.TestCase):
     
     def test_executive_gets_all(self):
         """Executive should get docs from all sensitivity levels."""
-        from src.retriever import get_retriever
-        retriever = get_retriever()
-        docs = retriever.retrieve("blackwell delay legal", "executive", k=10)
+        docs = self.retriever.retrieve("blackwell delay legal", "executive", k=10)
         sensitivities = {doc.metadata.get("sensitivity") for doc in docs}
         # Executive should be able to access insider docs
         # (may not always return all types in one query, but shouldn't be blocked)
@@ -126,48 +163,56 @@ class TestRetrieverFiltering(unittest.TestCase):
 class TestGuardrails(unittest.TestCase):
     """Test security guardrails."""
     
+    SAMPLES = [
+        "My SSN is 123-45-6789",
+        "Card: 4111-1111-1111-1111",
+        "Contact: john@company.com",
+        "Call 555-123-4567",
+        "Revenue was $18 billion",
+    ]
+    
+    @classmethod
+    def setUpClass(cls):
+        # One batched scan for all detection tests
+        cls.pii = dict(zip(cls.SAMPLES, check_pii_batch(cls.SAMPLES)))
+    
     def test_ssn_detection(self):
         """Should detect Social Security Numbers."""
-        from src.guardrails import check_pii
-        has_pii, pii_type = check_pii("My SSN is 123-45-6789")
+        has_pii, pii_type = self.pii["My SSN is 123-45-6789"]
         self.assertTrue(has_pii)
         self.assertEqual(pii_type, "ssn")
         print("✅ Test 9: SSN detection works")
     
     def test_credit_card_detection(self):
         """Should detect credit card numbers."""
-        from src.guardrails import check_pii
-        has_pii, pii_type = check_pii("Card: 4111-1111-1111-1111")
+        has_pii, pii_type = self.pii["Card: 4111-1111-1111-1111"]
         self.assertTrue(has_pii)
         self.assertEqual(pii_type, "credit_card")
         print("✅ Test 10: Credit card detection works")
     
     def test_email_detection(self):
         """Should detect email addresses."""
-        from src.guardrails import check_pii
-        has_pii, pii_type = check_pii("Contact: john@company.com")
+        has_pii, pii_type = self.pii["Contact: john@company.com"]
         self.assertTrue(has_pii)
         self.assertEqual(pii_type, "email")
         print("✅ Test 11: Email detection works")
     
     def test_phone_detection(self):
         """Should detect phone numbers."""
-        from src.guardrails import check_pii
-        has_pii, pii_type = check_pii("Call 555-123-4567")
+        has_pii, pii_type = self.pii["Call 555-123-4567"]
         self.assertTrue(has_pii)
         self.assertEqual(pii_type, "phone")
         print("✅ Test 12: Phone detection works")
     
     def test_clean_text_passes(self):
         """Clean text should pass PII check."""
-        from src.guardrails import check_pii
-        has_pii, _ = check_pii("Revenue was $18 billion")
+        has_pii, _ = self.pii["Revenue was $18 billion"]
         self.assertFalse(has_pii)
+        self.assertEqual(list(self.pii.values()), [check_pii(t) for t in self.SAMPLES])
         print("✅ Test 13: Clean text passes")
     
     def test_guardrail_blocks_pii(self):
         """Guardrail should block responses with PII."""
-        from src.guardrails import guardrail_check
         passed, response = guardrail_check(
             "context", 
             "The SSN is 123-45-6789"
@@ -175,6 +220,13 @@ class TestGuardrails(unittest.TestCase):
         self.assertFalse(passed)
         self.assertIn("BLOCKED", response)
         print("✅ Test 14: Guardrail blocks PII in responses")
+    
+    def test_stream_withholds_pii(self):
+        """Streaming should hold back possible PII prefixes and stop at a match."""
+        self.assertEqual(streamable_prefix("Revenue was $18.12B "), "Revenue was $18.12B")
+        self.assertEqual(streamable_prefix("The SSN is 123-45-"), "The SSN is")
+        self.assertIsNone(streamable_prefix("The SSN is 123-45-6789 and"))
+        print("✅ Test 15: Streaming withholds PII")
 
 
 class TestCalculatorTool(unittest.TestCase):
@@ -182,23 +234,20 @@ class TestCalculatorTool(unittest.TestCase):
     
     def test_basic_calculation(self):
         """Should execute basic math."""
-        from src.guardrails import python_calculator
         code = "result = 18.12 * 1.10"
         output = python_calculator(code)
         self.assertIn("19.932", output)
-        print("✅ Test 15: Basic calculation works")
+        print("✅ Test 16: Basic calculation works")
     
     def test_missing_result_variable(self):
         """Should error if 'result' not assigned."""
-        from src.guardrails import python_calculator
         code = "x = 5 + 3"
         output = python_calculator(code)
         self.assertIn("Error", output)
-        print("✅ Test 16: Missing result variable handled")
+        print("✅ Test 17: Missing result variable handled")
     
     def test_complex_calculation(self):
         """Should handle complex calculations."""
-        from src.guardrails import python_calculator
         code = """
 import math
 principal = 1000
@@ -208,59 +257,123 @@ result = principal * math.pow(1 + rate, years)
 """
         output = python_calculator(code)
         self.assertIn("Calculated Result", output)
-        print("✅ Test 17: Complex calculation works")
+        print("✅ Test 18: Complex calculation works")
+    
+    def test_unsafe_code_rejected(self):
+        """Should refuse imports, dunder access, non-math calls and runaway arithmetic."""
+        for code in [
+            "import os\nresult = os.getcwd()",
+            "result = ().__class__.__bases__",
+            "result = open('audit_log.jsonl').read()",
+            "result = __import__('os')",
+            # Resource exhaustion: must fail fast instead of hanging or eating memory
+            "result = 9**9**9**9",
+            "result = [0]*10**10",
+            "x = [0]\nx *= 10**10\nresult = len(x)",
+            "result = pow(10, 10**10)",
+            "result = 1 << 10**10",
+            "result = math.factorial(10**9)",
+            "result = round(7, -10**9)",
+            "math.pi = 3\nresult = math.pi",
+        ]:
+            output = python_calculator(code)
+            self.assertIn("Error", output, f"Unsafe code ran: {code}")
+        print("✅ Test 19: Unsafe calculator code rejected")
 
 
+@openai_group
 class TestDynamicPrompts(unittest.TestCase):
     """Test role-based dynamic prompting."""
     
     def test_executive_gets_concise_response(self):
         """Executive responses should be concise (bullet points)."""
-        from src.agent import ask
         response = ask("Summarize the financial situation", role="executive")
         # Executive response should be shorter than analyst
         self.assertLess(len(response), 1000, "Executive response too long")
-        print("✅ Test 18: Executive gets concise response")
+        print("✅ Test 20: Executive gets concise response")
     
     def test_analyst_gets_detailed_response(self):
         """Analyst responses should be detailed."""
-        from src.agent import ask
         response = ask("What was Q3 revenue?", role="analyst")
         # Should have substantive content
         self.assertGreater(len(response), 50, "Analyst response too short")
-        print("✅ Test 19: Analyst gets detailed response")
+        print("✅ Test 21: Analyst gets detailed response")
 
 
+@openai_group
 class TestAuditLogging(unittest.TestCase):
     """Test audit logging functionality."""
     
     def test_log_file_created(self):
         """Audit log file should be created after queries."""
-        import os
-        from src.agent import ask
-        
         # Make a query to trigger logging
         ask("Test query", "analyst")
         
         # Check log file exists
         log_file = "audit_log.jsonl"
         self.assertTrue(os.path.exists(log_file), "Audit log not created")
-        print("✅ Test 20: Audit log file created")
+        print("✅ Test 22: Audit log file created")
     
     def test_log_entry_format(self):
         """Log entries should have correct format."""
-        import json
-        
+        flush_audit_log()
         log_file = "audit_log.jsonl"
         if os.path.exists(log_file):
             with open(log_file, 'r') as f:
-                lines = f.readlines()
-                if lines:
-                    entry = json.loads(lines[-1])
-                    required_fields = ["timestamp", "user_role", "query"]
-                    for field in required_fields:
-                        self.assertIn(field, entry, f"Missing field: {field}")
-        print("✅ Test 21: Log entry format correct")
+                last = deque(f, maxlen=1)  # only the newest entry is kept in memory
+            if last:
+                entry = json.loads(last[0])
+                required_fields = ["timestamp", "user_role", "query"]
+                for field in required_fields:
+                    self.assertIn(field, entry, f"Missing field: {field}")
+        print("✅ Test 23: Log entry format correct")
+
+
+class TestQueryCache(unittest.TestCase):
+    """Test the exact + semantic query cache."""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = QueryCache(path=os.path.join(self.tmpdir.name, "qa_cache.pkl"))
+    
+    def tearDown(self):
+        self.cache.flush()
+        self.tmpdir.cleanup()
+    
+    def _unit(self, *values):
+        v = np.array(values, dtype=np.float32)
+        return v / np.linalg.norm(v)
+    
+    def test_exact_hit_is_role_scoped(self):
+        """Exact hits should not leak across roles."""
+        self.cache.put("executive", "What is Project Blackwell?", self._unit(1, 0), [], "3-month delay")
+        hit, _ = self.cache.get("executive", "  what is project blackwell? ")
+        self.assertEqual(hit, ([], "3-month delay"))
+        with patch.object(self.cache, "embed", return_value=self._unit(1, 0)):
+            hit, _ = self.cache.get("analyst", "What is Project Blackwell?")
+        self.assertIsNone(hit)
+        print("✅ Test 24: Query cache exact hits are role-scoped")
+    
+    def test_semantic_hit(self):
+        """Near-duplicate questions should hit; unrelated ones should miss."""
+        self.cache.put("analyst", "What was Q3 revenue?", self._unit(1, 0), [], "$18.12B")
+        with patch.object(self.cache, "embed", return_value=self._unit(1, 0.05)):
+            hit, _ = self.cache.get("analyst", "Q3 revenue?")
+        self.assertEqual(hit, ([], "$18.12B"))
+        with patch.object(self.cache, "embed", return_value=self._unit(0, 1)):
+            hit, _ = self.cache.get("analyst", "Gross margin?")
+        self.assertIsNone(hit)
+        print("✅ Test 25: Query cache semantic hits work")
+    
+    def test_persisted_off_request_path(self):
+        """put() should not write to disk itself; flushed entries survive a reload."""
+        self.cache.put("analyst", "What was Q3 revenue?", self._unit(1, 0), [], "$18.12B")
+        self.assertFalse(os.path.exists(self.cache.path))
+        self.cache.flush()
+        reloaded = QueryCache(path=self.cache.path)
+        hit, _ = reloaded.get("analyst", "What was Q3 revenue?")
+        self.assertEqual(hit, ([], "$18.12B"))
+        print("✅ Test 26: Query cache persisted in the background")
 
 
 class TestVisionModule(unittest.TestCase):
@@ -270,14 +383,53 @@ class TestVisionModule(unittest.TestCase):
         """Should generate a sample chart."""
         try:
             from src.vision import generate_sample_chart
-            import os
             
             path = generate_sample_chart()
             self.assertTrue(os.path.exists(path), "Chart not generated")
-            print("✅ Test 22: Sample chart generated")
+            print("✅ Test 27: Sample chart generated")
         except ImportError:
             self.skipTest("Vision module not available")
     
+    def test_analysis_cache(self):
+        """Repeat chart questions should be served from the vision cache."""
+        try:
+            from src import vision
+        except ImportError:
+            self.skipTest("Vision module not available")
+        from pathlib import Path
+        from PIL import Image
+        
+        client = MagicMock()
+        client.chat.completions.create.return_value.choices = [MagicMock()]
+        client.chat.completions.create.return_value.choices[0].message.content = "NVIDIA revenue"
+        with tempfile.TemporaryDirectory() as tmp:
+            chart_path = os.path.join(tmp, "chart.png")
+            Image.new("RGB", (40, 30), "white").save(chart_path)
+            with patch.object(vision, "VISION_CACHE_DIR", Path(tmp) / "vision"), \
+                    patch.object(vision, "get_openai_client", return_value=client):
+                first = vision.analyze_chart(chart_path, "Which company?")
+                second = vision.analyze_chart(chart_path, "Which company?")
+                vision.analyze_chart(chart_path, "Which year?")
+                vision.analyze_chart(chart_path, "Which company?", detail="low")
+                # A failed cache write must not turn a paid-for answer into an error
+                with patch.object(vision.os, "replace", side_effect=OSError(28, "No space left on device")):
+                    unstored = vision.analyze_chart(chart_path, "Which quarter?")
+                # Streaming shares the cache
+                streamed = list(vision.analyze_chart_stream(chart_path, "Which company?"))
+                # Empty answers aren't cached, so the question is asked again
+                client.chat.completions.create.return_value.choices[0].message.content = ""
+                vision.analyze_chart(chart_path, "Which month?")
+                vision.analyze_chart(chart_path, "Which month?")
+        
+        self.assertEqual(first, "NVIDIA revenue")
+        self.assertEqual(second, first)
+        self.assertEqual(unstored, "NVIDIA revenue")
+        self.assertEqual(streamed, ["NVIDIA revenue"])
+        self.assertEqual(client.chat.completions.create.call_count, 6)
+        image_part = client.chat.completions.create.call_args_list[2].kwargs["messages"][1]["content"][1]
+        self.assertEqual(image_part["image_url"]["detail"], "low")
+        print("✅ Test 28: Vision answers cached per image, question and detail")
+    
     def test_device_detection(self):
         """Should detect available compute device."""
         try:
@@ -285,11 +437,121 @@ class TestVisionModule(unittest.TestCase):
             
             device = get_device()
             self.assertIn(device, ["mps", "cuda", "cpu"])
-            print(f"✅ Test 23: Device detected: {device}")
+            print(f"✅ Test 29: Device detected: {device}")
         except ImportError:
             self.skipTest("Vision module not available")
 
 
+class TestRateLimiter(unittest.TestCase):
+    """Test client-side throttling and token estimates (offline)."""
+    
+    def test_window_limits_requests(self):
+        """Requests beyond the per-window limit wait for the window to slide."""
+        limiter = RateLimiter(max_concurrency=4, requests_per_minute=2, tokens_per_minute=1000)
+        limiter.WINDOW_SECONDS = 0.3
+        start = time.monotonic()
+        for _ in range(3):
+            with limiter.limit(10):
+                pass
+        self.assertGreaterEqual(time.monotonic() - start, 0.25)
+        # A request larger than the whole TPM budget still gets through
+        with limiter.limit(10_000):
+            pass
+        print("✅ Test 30: Rate limiter holds requests to the window")
+    
+    def test_estimate_falls_back_without_encoding(self):
+        """Unknown model and missing encoding fall back to a length estimate."""
+        messages = [HumanMessage(content="x" * 400)]
+        with patch.object(throttle, "_encoding", None), \
+                patch.object(throttle, "_encoding_unavailable", False), \
+                patch.object(throttle.tiktoken, "encoding_for_model", side_effect=KeyError("gpt-4o-mini")), \
+                patch.object(throttle.tiktoken, "get_encoding", side_effect=ValueError("Unknown encoding o200k_base")):
+            self.assertEqual(estimate_tokens(messages, 512, "gpt-4o-mini"), 100 + 512)
+        print("✅ Test 31: Token estimate falls back when tiktoken can't encode")
+
+
+class TestAskMany(unittest.TestCase):
+    """Test batched answering with a stubbed LLM and retriever (offline)."""
+    
+    @staticmethod
+    def _llm_batch(prompts, config=None):
+        """Answer each prompt; 'grow' questions take one calculator round, 'loop' ones never finish."""
+        responses = []
+        for prompt in prompts:
+            question = next(m.content for m in prompt if isinstance(m, HumanMessage))
+            if isinstance(prompt[-1], ToolMessage) and "loop" not in question:
+                responses.append(AIMessage(content=f"Answer: {prompt[-1].content}"))
+            elif "grow" in question or "loop" in question:
+                responses.append(AIMessage(content="", tool_calls=[
+                    {"name": "python_calculator", "args": {"code": "result = 18.12 * 1.1"}, "id": "call-1"}
+                ]))
+            else:
+                responses.append(AIMessage(content=f"Answer to: {question}"))
+        return responses
+    
+    def test_batched_answers(self):
+        """Order, cache hits, invalid roles, a calculator round and an unfinished calculation."""
+        docs = [Document(page_content="Q3 revenue was $18.12B", metadata={"source": "q3.txt", "sensitivity": "public"})]
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = QueryCache(path=os.path.join(tmp, "qa_cache.pkl"))
+            cache.put("analyst", "Cached question?", np.array([1, 0], dtype=np.float32), [], "cached answer")
+            llm = MagicMock()
+            llm.batch.side_effect = self._llm_batch
+            with patch.object(cache, "embed", return_value=np.array([0, 1], dtype=np.float32)), \
+                    patch.object(src.agent, "get_query_cache", return_value=cache), \
+                    patch.object(src.agent, "_retrieve_context", return_value=(docs, "[q3.txt, public] Q3 revenue was $18.12B")), \
+                    patch.object(src.agent, "throttled_llm", llm), \
+                    patch.object(src.agent, "MAX_REACT_ROUNDS", 3), \
+                    patch.object(src.agent, "log_access") as log_access:
+                results = ask_many([
+                    ("What was Q3 revenue?", "analyst"),
+                    ("Cached question?", "analyst"),
+                    ("Anything?", "intern"),
+                    ("If revenue grows 10%?", "analyst"),
+                    ("loop forever", "analyst"),
+                ])
+            cache.flush()
+        
+        self.assertEqual(results[0], "Answer to: What was Q3 revenue?")
+        self.assertEqual(results[1], "cached answer")
+        self.assertIn("Invalid role", results[2])
+        self.assertEqual(results[3], "Answer: Calculated Result: 19.932000000000002")
+        self.assertEqual(results[4], src.agent.UNFINISHED_CALCULATION_MESSAGE)
+        logged = [call.args[1] for call in log_access.call_args_list]
+        self.assertCountEqual(logged, ["Cached question?", "What was Q3 revenue?", "If revenue grows 10%?", "loop forever"])
+        print("✅ Test 32: ask_many batches, caches and finishes every question")
+
+
+class TestQueryDenial(unittest.TestCase):
+    """Test the restricted-keyword check before retrieval, with a stubbed retriever (offline)."""
+    
+    def test_restricted_keywords(self):
+        """Analysts asking for confidential/insider data skip retrieval; executives don't."""
+        docs = [Document(page_content="Q3 revenue was $18.12B", metadata={"source": "q3.txt", "sensitivity": "public"})]
+        retriever = MagicMock()
+        retriever.get_allowed_sensitivities.side_effect = \
+            lambda role: SecureRetriever.get_allowed_sensitivities(retriever, role)
+        retriever.retrieve.return_value = docs
+        embedding = np.array([0, 1], dtype=np.float32)
+        with patch.object(src.agent, "get_retriever", return_value=retriever):
+            self.assertTrue(src.agent._is_denied("Show me CONFIDENTIAL forecasts", "analyst"))
+            self.assertTrue(src.agent._is_denied("Any insider info?", "analyst"))
+            self.assertTrue(src.agent._is_denied("Any insider info?", "product_manager"))
+            self.assertFalse(src.agent._is_denied("Any insider info?", "executive"))
+            # Whole words only
+            self.assertFalse(src.agent._is_denied("What is our confidentiality policy?", "analyst"))
+            self.assertFalse(src.agent._is_denied("Were there insiders trades?", "analyst"))
+            
+            denied = src.agent._retrieve_context("Show me confidential forecasts", "analyst", embedding)
+            retriever.retrieve.assert_not_called()
+            allowed = src.agent._retrieve_context("Show me confidential forecasts", "executive", embedding)
+        
+        self.assertEqual(denied, ([], ""))
+        self.assertEqual(allowed[0], docs)
+        self.assertIs(retriever.retrieve.call_args.kwargs["embedding"], embedding)
+        print("✅ Test 33: Restricted keywords deny lower roles before retrieval")
+
+
 def run_all_tests():
     """Run all tests with summary."""
     print("\n" + "="*60)
@@ -308,7 +570,11 @@ def run_all_tests():
     suite.addTests(loader.loadTestsFromTestCase(TestCalculatorTool))
     suite.addTests(loader.loadTestsFromTestCase(TestDynamicPrompts))
     suite.addTests(loader.loadTestsFromTestCase(TestAuditLogging))
+    suite.addTests(loader.loadTestsFromTestCase(TestQueryCache))
     suite.addTests(loader.loadTestsFromTestCase(TestVisionModule))
+    suite.addTests(loader.loadTestsFromTestCase(TestRateLimiter))
+    suite.addTests(loader.loadTestsFromTestCase(TestAskMany))
+    suite.addTests(loader.loadTestsFromTestCase(TestQueryDenial))
     
     # Run tests
     runner = unittest.TextTestRunner(verbosity=2)